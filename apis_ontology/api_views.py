@@ -1,10 +1,23 @@
+import hashlib
+import json
+
 from django.apps import apps
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apis_core.generic.api_views import ModelViewSet
 from apis_core.relations.models import Relation
+from apis_ontology.models import CacheVersion, Person
+from apis_ontology.network import person_network
+from apis_ontology.pagination import KeysetPagination
 
 # ListRelationTypesAPIView API endpoint:
 #
@@ -44,6 +57,64 @@ from apis_core.relations.models import Relation
 #
 # 20260729: added the `possible_types` attribute for relation types
 # that have a `legacy_relation_vocab_label` attribute
+#
+# 20261017: the response is cached and has an `ETag`, so clients can
+# poll using `If-None-Match`
+
+
+RELATION_TYPES_CACHE_KEY = "apis_ontology_listrelationtypes"
+
+
+def relation_types():
+    """
+    Collect the relation types and compute an ETag for them. The result
+    is cached until a legacy relation is saved or deleted, which increases
+    the version of the relation types in the database (see `signals.py`),
+    or the `OEBL_RELATION_TYPES_CACHE_TIMEOUT` expires.
+    """
+    version = CacheVersion.get(RELATION_TYPES_CACHE_KEY)
+    cache_key = f"{RELATION_TYPES_CACHE_KEY}_{version}"
+    if cached := cache.get(cache_key):
+        return cached
+    relation_classes = list(
+        filter(lambda x: issubclass(x, Relation), apps.get_models())
+    )
+    relation_classes = list(filter(lambda x: x != Relation, relation_classes))
+    relations = {}
+    for cls in relation_classes:
+        content_type = ContentType.objects.get_for_model(cls)
+        relations[content_type.model] = {
+            "model": f"{content_type.app_label}.{content_type.model}",
+            "class_name": cls.__name__,
+            "name": cls.name(),
+            "reverse_name": cls.reverse_name(),
+            "subj_model": cls.subj_model.__name__,
+            "obj_model": cls.obj_model.__name__,
+            "legacy_property_id": getattr(cls, "_legacy_property_id", None),
+        }
+        if hasattr(cls, "legacy_relation_vocab_label"):
+            fields = (
+                "legacy_relation_vocab_label",
+                "legacy_relation_vocab_label_reverse",
+            )
+            labels = cls.objects.order_by(*fields).values_list(*fields).distinct()
+            labels = [
+                {"forward": forward, "reverse": reverse}
+                for (forward, reverse) in labels
+            ]
+            relations[content_type.model]["possible_types"] = labels
+    data = json.dumps(relations, sort_keys=True, default=str)
+    result = (relations, hashlib.sha256(data.encode()).hexdigest())
+    timeout = getattr(settings, "OEBL_RELATION_TYPES_CACHE_TIMEOUT", 3600)
+    cache.set(cache_key, result, timeout)
+    return result
+
+
+def relation_types_etag(request, *args, **kwargs):
+    # the relation types are needed again to answer the request,
+    # so they are kept on the request instead of looking them up twice
+    request.relation_types = relation_types()
+    return request.relation_types[1]
 
 
 class ListRelationTypesAPIView(APIView):
@@ -53,31 +124,75 @@ class ListRelationTypesAPIView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(etag(relation_types_etag))
     def get(self, request, format=None):
-        relation_classes = list(
-            filter(lambda x: issubclass(x, Relation), apps.get_models())
+        relations, _ = request.relation_types
+        return Response({"relations": relations})
+
+
+class KeysetModelViewSet(ModelViewSet):
+    """
+    Variant of the generic API list endpoint that uses keyset pagination,
+    for clients that walk through all the objects of a model
+    """
+
+    pagination_class = KeysetPagination
+
+
+class PersonNetworkAPIView(APIView):
+    """
+    The persons that are at most `depth` relations away from a person,
+    and the relations between them, based on the adjacency list of the
+    relations between persons (see `network.py`)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, person_id, format=None):
+        person = get_object_or_404(Person.objects.only("pk"), pk=person_id)
+        max_depth = getattr(settings, "OEBL_NETWORK_MAX_DEPTH", 3)
+        try:
+            depth = int(request.query_params.get("depth", 1))
+        except ValueError:
+            raise ValidationError({"depth": "A valid integer is required."})
+        if not 1 <= depth <= max_depth:
+            raise ValidationError({"depth": f"Must be between 1 and {max_depth}."})
+
+        max_nodes = getattr(settings, "OEBL_NETWORK_MAX_NODES", 1000)
+        max_edges = getattr(settings, "OEBL_NETWORK_MAX_EDGES", 5000)
+        distances, edges, truncated = person_network(
+            person.pk, depth, max_nodes, max_edges
         )
-        relation_classes = list(filter(lambda x: x != Relation, relation_classes))
-        relations = {}
-        for cls in relation_classes:
-            content_type = ContentType.objects.get_for_model(cls)
-            relations[content_type.model] = {
-                "model": f"{content_type.app_label}.{content_type.model}",
-                "class_name": cls.__name__,
-                "name": cls.name(),
-                "reverse_name": cls.reverse_name(),
-                "subj_model": cls.subj_model.__name__,
-                "obj_model": cls.obj_model.__name__,
-                "legacy_property_id": getattr(cls, "_legacy_property_id", None),
+        names = Person.objects.filter(pk__in=distances).values_list(
+            "pk", "display_name"
+        )
+        nodes = [
+            {"id": pk, "label": name, "depth": distances[pk]} for pk, name in names
+        ]
+        relation_types = {
+            content_type.pk: f"{content_type.app_label}.{content_type.model}"
+            for content_type in map(
+                ContentType.objects.get_for_id,
+                {edge["relation_type_id"] for edge in edges.values()},
+            )
+        }
+        edges = [
+            {
+                "id": edge["relation_id"],
+                "relation_type": relation_types[edge["relation_type_id"]],
+                "subj": edge["subj_object_id"],
+                "obj": edge["obj_object_id"],
+                "start_date_sort": edge["start_date_sort"],
+                "end_date_sort": edge["end_date_sort"],
             }
-            if hasattr(cls, "legacy_relation_vocab_label"):
-                labels = cls.objects.values_list(
-                    "legacy_relation_vocab_label", "legacy_relation_vocab_label_reverse"
-                )
-                labels = [
-                    {"forward": forward, "reverse": reverse}
-                    for (forward, reverse) in (set(labels))
-                ]
-                relations[content_type.model]["possible_types"] = labels
-
-        return Response({"relations": relations})
+            for edge in edges.values()
+        ]
+        return Response(
+            {
+                "person": person.pk,
+                "depth": depth,
+                "truncated": truncated,
+                "nodes": sorted(nodes, key=lambda node: (node["depth"], node["id"])),
+                "edges": edges,
+            }
+        )
@@ -7,3 +7,6 @@ class ApisOntologyConfig(AppConfig):
 
     def ready(self):
         from . import signals  # noqa: F401
+        from .lookups import register_lookups
+
+        register_lookups()
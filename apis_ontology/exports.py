@@ -0,0 +1,109 @@
+import heapq
+import itertools
+from contextlib import ExitStack
+
+from django.apps import apps
+from rdflib import Graph
+
+from apis_core.generic.helpers import first_member_match, module_paths
+from apis_core.generic.serializers import GenericModelCidocSerializer
+from apis_core.relations.models import Relation
+from apis_core.relations.utils import relation_content_types
+from apis_ontology.models import Institution, Person, Place
+from apis_ontology.querysets import PERSON_TEXT_FIELDS
+
+FORMATS = {"nt": "nt", "ttl": "turtle"}
+
+
+def export_models():
+    relation_models = [
+        ct.model_class()
+        for ct in relation_content_types(combination=(Person, Institution))
+    ]
+    return [Person, Institution, Place] + sorted(
+        relation_models, key=lambda model: model.__name__
+    )
+
+
+def get_serializer_class(model):
+    serializer_class_modules = module_paths(
+        model, path="serializers", suffix="CidocSerializer"
+    )
+    return first_member_match(serializer_class_modules, GenericModelCidocSerializer)
+
+
+def get_queryset(model):
+    queryset = model.objects.order_by("pk")
+    if model is Person:
+        queryset = queryset.defer(*PERSON_TEXT_FIELDS)
+    if issubclass(model, Relation):
+        queryset = queryset.select_related(
+            "subj_content_type", "obj_content_type"
+        ).prefetch_related("subj", "obj")
+    return queryset
+
+
+def serialize_model(model, output, rdf_format, chunk_size):
+    """
+    Serialize all instances of `model` and write them to the binary file
+    object `output`. The instances are fetched using a server side cursor
+    and every chunk is serialized to its own graph, so the memory usage
+    does not depend on the number of instances.
+    """
+    serializer_class = get_serializer_class(model)
+    queryset = get_queryset(model).iterator(chunk_size=chunk_size)
+    count = 0
+    for chunk in itertools.batched(queryset, chunk_size):
+        graph = Graph()
+        serializer = serializer_class(chunk, many=True, context={"request": None})
+        for g in serializer.data:
+            graph += g
+            for prefix, namespace in g.namespaces():
+                graph.bind(prefix, namespace, override=False)
+        output.write(graph.serialize(format=rdf_format, encoding="utf-8"))
+        count += len(chunk)
+    return count
+
+
+def serialize_model_to_file(model_label, path, rdf_format, chunk_size):
+    model = apps.get_model(model_label)
+    with open(path, "wb") as output:
+        return serialize_model(model, output, rdf_format, chunk_size)
+
+
+def relation_models():
+    return [model for model in export_models() if issubclass(model, Relation)]
+
+
+def serialize_shard(model_label, ids, path, chunk_size):
+    """
+    Serialize the instances of the model with the given `ids` to a shard
+    file containing sorted and deduplicated N-Triples.
+    """
+    model = apps.get_model(model_label)
+    serializer_class = get_serializer_class(model)
+    queryset = get_queryset(model).filter(pk__in=ids).iterator(chunk_size=chunk_size)
+    lines = set()
+    for chunk in itertools.batched(queryset, chunk_size):
+        serializer = serializer_class(chunk, many=True, context={"request": None})
+        for g in serializer.data:
+            lines.update(g.serialize(format="nt", encoding="utf-8").splitlines())
+    lines.discard(b"")
+    with open(path, "wb") as shard:
+        shard.writelines(line + b"\n" for line in sorted(lines))
+    return len(ids)
+
+
+def merge_shards(paths, output):
+    """
+    Merge sorted N-Triples shard files into one sorted file without
+    duplicates. As long as the data does not change, the output is
+    byte-identical, no matter how the input was partitioned.
+    """
+    previous = None
+    with ExitStack() as stack:
+        shards = [stack.enter_context(open(path, "rb")) for path in paths]
+        for line in heapq.merge(*shards):
+            if line != previous:
+                output.write(line)
+                previous = line
@@ -3,16 +3,27 @@ import unicodedata
 
 import django_filters
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.postgres.search import TrigramWordSimilarity
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
 from django.db import models
+from django.db.models import F, Q, Value
 from django.db.models.functions import Greatest
+from django_filters.filterset import remote_queryset
 from django_interval.fields import FuzzyDateParserField
 from django_interval.filters import DateIntervalRangeFilter
 
 from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
 from apis_core.entities.filtersets import EntityFilterSet
+from apis_core.generic.helpers import split_and_strip_parameter
+from apis_ontology.lookups import ImmutableUnaccent
+from apis_ontology.querysets import PERSON_TEXT_FIELDS
+from apis_ontology.search import SEARCH_CONFIG
 
 PERSON_HELP_TEXT = "Search for similar words in <em>forename</em> & <em>name</em> based on <a href='https://www.postgresql.org/docs/current/pgtrgm.html#PGTRGM-CONCEPTS'>trigram matching</a>."
+FULLTEXT_HELP_TEXT = "Search in the name and biography text fields using <a href='https://www.postgresql.org/docs/current/textsearch-controls.html#TEXTSEARCH-PARSING-QUERIES'>web search syntax</a>."
 HELP_TEXT = "Search for similar words in <em>label</em> based on <a href='https://www.postgresql.org/docs/current/pgtrgm.html#PGTRGM-CONCEPTS'>trigram matching</a>."
 
 
@@ -39,9 +50,7 @@ def remove_accents(input_str):
 
 
 def trigram_search_filter_person(queryset, name, value):
-    return trigram_search_filter(
-        queryset, ["surname__unaccent", "forename__unaccent"], value
-    )
+    return trigram_search_filter(queryset, ["surname", "forename"], value)
 
 
 def trigram_search_filter_institution(queryset, name, value):
@@ -53,18 +62,46 @@ def trigram_search_filter_place(queryset, name, value):
 
 
 def trigram_search_filter(queryset, fields, value):
+    """
+    Filter the queryset using the `%>` trigram word similarity operator,
+    which - contrary to comparing the `word_similarity` value - can use
+    the `gin_trgm_ops` indexes on `immutable_unaccent(field)`. The
+    threshold is set via `OEBL_TRIGRAM_WORD_SIMILARITY_THRESHOLD`.
+    """
     tokens = PATTERN.split(value)
     tokens = list(filter(str.strip, tokens))
     tokens = set(list(map(remove_quotes, tokens)) + [value])
+    tokens = set(map(remove_accents, tokens))
+    query = Q()
     trig_vector_list = []
     for token in tokens:
         for field in fields:
-            trig_vector_list.append(TrigramWordSimilarity(remove_accents(token), field))
+            query |= Q(**{f"{field}__immutable_unaccent__trigram_word_similar": token})
+            trig_vector_list.append(
+                TrigramWordSimilarity(token, ImmutableUnaccent(field))
+            )
     trig_vector = Greatest(*trig_vector_list, None)
     return (
-        queryset.annotate(similarity=trig_vector)
-        .filter(similarity__gt=0.5)
-        .order_by("-similarity")
+        queryset.filter(query).annotate(similarity=trig_vector).order_by("-similarity")
+    )
+
+
+def fulltext_search_filter_person(queryset, name, value):
+    # the query is unaccented in the database, like the search documents
+    query = SearchQuery(
+        ImmutableUnaccent(Value(value)), config=SEARCH_CONFIG, search_type="websearch"
+    )
+    return (
+        queryset.filter(search_document__document=query)
+        .annotate(rank=SearchRank(F("search_document__document"), query))
+        .order_by("-rank")
+    )
+
+
+def sparse_fieldset_method(queryset, name, value):
+    fields = split_and_strip_parameter([value])
+    return queryset.defer(None).defer(
+        *[field for field in PERSON_TEXT_FIELDS if field not in fields]
     )
 
 
@@ -78,6 +115,46 @@ def collection_method(queryset, name, value):
     return queryset
 
 
+################
+# custom filters
+################
+
+
+class SubqueryModelMultipleChoiceFilter(django_filters.ModelMultipleChoiceFilter):
+    """
+    Filter a many to many relation using a `pk__in` subquery instead of
+    joining the related table, so the result does not contain duplicates
+    and the queryset does not have to use `.distinct()`. Like the
+    `ModelMultipleChoiceFilter`, the choices are combined using OR,
+    or AND if `conjoined` is set, and `exclude` excludes the matches.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # the subqueries do not multiply the rows
+        kwargs.setdefault("distinct", False)
+        super().__init__(*args, **kwargs)
+
+    def subquery(self, qs, q):
+        return qs.model._base_manager.filter(q).values("pk")
+
+    def filter(self, qs, value):
+        if not value or self.is_noop(qs, value):
+            return qs
+        predicates = [
+            Q(**self.get_filter_predicate(None if v == self.null_value else v))
+            for v in set(value)
+        ]
+        if self.conjoined:
+            for predicate in predicates:
+                qs = self.get_method(qs)(pk__in=self.subquery(qs, predicate))
+        else:
+            q = Q()
+            for predicate in predicates:
+                q |= predicate
+            qs = self.get_method(qs)(pk__in=self.subquery(qs, q))
+        return qs.distinct() if self.distinct else qs
+
+
 ###################
 # custom filtersets
 ###################
@@ -98,6 +175,10 @@ class LegacyStuffMixinFilterSet(EntityFilterSet):
                     "lookup_expr": "unaccent__icontains",
                 },
             },
+            models.ManyToManyField: {
+                "filter_class": SubqueryModelMultipleChoiceFilter,
+                "extra": lambda f: {"queryset": remote_queryset(f)},
+            },
             FuzzyDateParserField: {"filter_class": DateIntervalRangeFilter},
         }
 
@@ -129,6 +210,19 @@ class PersonFilterSet(LegacyStuffMixinFilterSet):
             label="Search",
             help_text=PERSON_HELP_TEXT,
         )
+        self.filters["fulltext"] = django_filters.CharFilter(
+            method=fulltext_search_filter_person,
+            label="Fulltext",
+            help_text=FULLTEXT_HELP_TEXT,
+        )
+
+
+class PersonApiFilterSet(PersonFilterSet):
+    fields = django_filters.CharFilter(
+        method=sparse_fieldset_method,
+        label="Fields",
+        help_text="Comma separated list of fields to include in the response.",
+    )
 
 
 class InstitutionFilterSet(LegacyStuffMixinFilterSet):
@@ -0,0 +1,317 @@
+"""
+Helpers shared by the management commands that import the data
+of the legacy APIS instance.
+"""
+
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from itertools import batched, islice
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util import Retry
+
+from apis_core.apis_metainfo.models import RootObject
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+SRC = "https://apis.acdh.oeaw.ac.at/apis/api"
+TOKEN = os.environ.get("TOKEN")
+HEADERS = {"Authorization": f"Token {TOKEN}"} if TOKEN else {}
+WORKERS = 8
+
+# The responses of the legacy API are cached on disk, so rerunning an
+# import does not have to fetch them again. With `LEGACY_OFFLINE` set,
+# only the cached responses are used, regardless of their age.
+CACHE_FILE = pathlib.Path(os.environ.get("LEGACY_CACHE", "legacy_cache.sqlite"))
+CACHE_TTL = int(os.environ.get("LEGACY_CACHE_TTL", 60 * 60 * 24 * 30))
+OFFLINE = bool(os.environ.get("LEGACY_OFFLINE"))
+
+revisions_file = pathlib.Path("data/reversion.json")
+relations_file = pathlib.Path("relations.json")
+
+logger = logging.getLogger(__name__)
+
+
+class OfflineError(requests.ConnectionError):
+    pass
+
+
+class CachedSession(requests.Session):
+    """
+    A session that stores the successful responses to GET requests in
+    a SQLite database, keyed by URL. Cached responses older than `ttl`
+    seconds are fetched again, unless the session is `offline`, in which
+    case requests that are not cached fail with an `OfflineError`.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, offline=OFFLINE):
+        super().__init__()
+        self.ttl = ttl
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(url TEXT PRIMARY KEY, fetched REAL, headers TEXT, content BLOB)"
+        )
+
+    def close(self):
+        super().close()
+        self.db.close()
+
+    def lookup(self, url):
+        with self.lock:
+            return self.db.execute(
+                "SELECT fetched, headers, content FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def store(self, url, response):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (
+                    url,
+                    time.time(),
+                    json.dumps(dict(response.headers)),
+                    response.content,
+                ),
+            )
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+        if cached := self.lookup(request.url):
+            fetched, headers, content = cached
+            if self.offline or time.time() - fetched < self.ttl:
+                response = requests.Response()
+                response.status_code = 200
+                response.headers = CaseInsensitiveDict(json.loads(headers))
+                response._content = content
+                response.url = request.url
+                response.request = request
+                return response
+        if self.offline:
+            raise OfflineError(f"{request.url} is not cached", request=request)
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            self.store(request.url, response)
+        return response
+
+
+def legacy_session(retries=5, backoff_factor=1, workers=WORKERS, cache_file=CACHE_FILE):
+    """
+    A session for talking to the API of the legacy instance. Responses
+    are cached on disk (see `CachedSession`), failed requests are retried
+    with an exponential backoff, and the connection pool is large enough
+    to be shared by `workers` threads.
+    """
+    session = CachedSession(cache_file)
+    session.headers.update(HEADERS)
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(
+        max_retries=retry, pool_connections=workers, pool_maxsize=workers
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@cache
+def shared_session():
+    return legacy_session()
+
+
+def with_query(url, **params):
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = dict(parse_qsl(query)) | {key: str(value) for key, value in params.items()}
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+def fetch_pages(url, session=None, limit=1000, offset=0, workers=WORKERS):
+    """
+    Fetch all the pages of a list endpoint of the legacy API, starting at
+    `offset`, and yield them in order. The first page tells us the number
+    of results, which we use to compute the offsets of all the other pages
+    instead of following the `next` links one by one. The pages are then
+    fetched by a pool of `workers` threads; at most twice as many pages
+    as there are workers are held in memory at any time.
+    """
+    session = session or shared_session()
+
+    def fetch(offset):
+        page_url = with_query(url, format="json", limit=limit, offset=offset)
+        logger.debug("Fetching %s", page_url)
+        response = session.get(page_url)
+        response.raise_for_status()
+        return response.json()
+
+    first = fetch(offset)
+    if not first["results"]:
+        return
+    yield first
+    offsets = iter(range(offset + limit, first["count"], limit))
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque(pool.submit(fetch, o) for o in islice(offsets, workers * 2))
+        while pending:
+            page = pending.popleft().result()
+            if (next_offset := next(offsets, None)) is not None:
+                pending.append(pool.submit(fetch, next_offset))
+            yield page
+
+
+def write_json_items(path, items):
+    """
+    Write the `(key, value)` pairs of `items` to `path` as a JSON object,
+    one pair at a time. The data is written to a temporary file that is
+    only moved to `path` once all items were written, so an interrupted
+    download does not leave an incomplete file behind.
+    """
+    path = pathlib.Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w") as f:
+        f.write("{")
+        for pos, (key, value) in enumerate(items):
+            if pos:
+                f.write(",")
+            f.write(f"\n  {json.dumps(str(key))}: {json.dumps(value)}")
+        f.write("\n}\n")
+    tmp.replace(path)
+
+
+def iter_json_items(path):
+    """
+    Iterate over the `(key, value)` pairs of the JSON object stored
+    in `path`. If `ijson` is installed (it is part of the `import` extra),
+    the file is parsed incrementally, so the dump never has to be in
+    memory as a whole.
+    """
+    path = pathlib.Path(path)
+    if ijson is None:
+        yield from json.loads(path.read_text()).items()
+    else:
+        with path.open("rb") as f:
+            yield from ijson.kvitems(f, "", use_float=True)
+
+
+class RevisionIndex:
+    """
+    Index of the revision dump of the legacy instance. The dump maps
+    object ids to revisions; the index maps `(model, id)` to the
+    timestamp and user of the first revision of that object, so looking
+    up the revision of an object does not mean scanning the whole dump.
+    The other fields of the revisions are not used by the importers and
+    are not kept in memory.
+    """
+
+    def __init__(self, path=revisions_file):
+        self.revisions = {}
+        self.users = set()
+        for object_id, revision in iter_json_items(path):
+            key = (revision["model"], str(object_id))
+            if key not in self.revisions:
+                self.revisions[key] = (revision["timestamp"], revision.get("user"))
+            if revision.get("user"):
+                self.users.add(revision["user"])
+
+    def get(self, model, object_id):
+        if revision := self.revisions.get((model, str(object_id))):
+            timestamp, user = revision
+            return {"timestamp": timestamp, "user": user}
+
+
+def load_texts(path):
+    """
+    Load the texts dump, which maps text ids to texts.
+    """
+    return dict(iter_json_items(path))
+
+
+def resolve_objects(ids, chunk_size=5000):
+    """
+    Look up the root objects with the given `ids` as instances of their
+    subclasses. The lookup is done in chunks, using one query per chunk,
+    and returns a mapping of ids to instances and their content types.
+    """
+    objects = {}
+    for chunk in batched(ids, chunk_size):
+        for obj in RootObject.objects_inheritance.filter(
+            id__in=chunk
+        ).select_subclasses():
+            objects[obj.pk] = (obj, ContentType.objects.get_for_model(obj))
+    return objects
+
+
+def bulk_create_inherited(model, instances):
+    """
+    Insert `instances` of a model that uses multi table inheritance,
+    which `bulk_create` does not support. Like `save`, the rows are
+    inserted into the tables of the parents first, but using one query
+    per table and batch instead of one per instance and table. The
+    instances need to have their primary keys set.
+    """
+    connection = connections[router.db_for_write(model)]
+    tables = [*reversed(model._meta.get_parent_list()), model]
+    for instance in instances:
+        for table in tables:
+            setattr(instance, table._meta.pk.attname, instance.pk)
+    for table in tables:
+        fields = table._meta.local_concrete_fields
+        batch_size = max(connection.ops.bulk_batch_size(fields, instances), 1)
+        for batch in batched(instances, batch_size):
+            table._base_manager.using(connection.alias)._insert(batch, fields=fields)
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = connection.alias
+
+
+def bulk_history_create(model, instances, **kwargs):
+    """
+    Write the history of `instances` using `bulk_history_create`, which
+    only writes the historical records of the instances themselves. When
+    saving an instance, the historical records of its many to many fields
+    are written as well, so we create those from the through tables.
+    """
+    HistoricalModel = model.history.model
+    history = model.history.bulk_history_create(instances, **kwargs)
+    for field in HistoricalModel._history_m2m_fields:
+        HistoricalM2M = getattr(HistoricalModel, field.name).model
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        rows = defaultdict(list)
+        for row in field.remote_field.through.objects.filter(
+            **{f"{source}_id__in": [record.id for record in history]}
+        ).values_list("pk", f"{source}_id", f"{target}_id"):
+            rows[row[1]].append(row)
+        HistoricalM2M.objects.bulk_create(
+            [
+                HistoricalM2M(
+                    id=pk,
+                    history=record,
+                    **{f"{source}_id": source_id, f"{target}_id": target_id},
+                )
+                for record in history
+                for pk, source_id, target_id in rows[record.id]
+            ]
+        )
+    return history
@@ -0,0 +1,19 @@
+from django.db.models import CharField, TextField, Transform
+
+
+class ImmutableUnaccent(Transform):
+    """
+    Wrapper around the `immutable_unaccent` database function, which is
+    created in migration `0064`. Contrary to `unaccent` it is marked
+    `IMMUTABLE`, which means it can be used in expression indexes - the
+    trigram search indexes on names and labels are built on top of it.
+    """
+
+    bilateral = True
+    lookup_name = "immutable_unaccent"
+    function = "immutable_unaccent"
+
+
+def register_lookups():
+    CharField.register_lookup(ImmutableUnaccent)
+    TextField.register_lookup(ImmutableUnaccent)
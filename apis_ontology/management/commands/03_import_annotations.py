@@ -1,12 +1,15 @@
 import csv
 import json
 import pathlib
+import time
+from itertools import batched
 
 from apis_highlighter.models import Annotation, AnnotationProject
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from apis_core.apis_relations.models import TempTriple
+from apis_core.relations.models import Relation
 from apis_ontology.models import Person
 
 user_mapping = {
@@ -19,58 +22,117 @@ user_mapping = {
     27: "APiechl",
 }
 
+# the content type of persons in the legacy instance
+PERSON_CONTENT_TYPE_ID = 8
+BATCH_SIZE = 1000
+
+annotations_file = pathlib.Path("data/annotations_oebl_export_10-2023.csv")
+mapping_file = pathlib.Path("text_to_entity_mapping.json")
+
+
+def read_rows():
+    with annotations_file.open() as f:
+        for row in csv.DictReader(f):
+            if row["content_type_id"] and row["object_id"]:
+                yield row
+
+
+def is_person(row):
+    return int(row["content_type_id"]) == PERSON_CONTENT_TYPE_ID
+
 
 class Command(BaseCommand):
     help = "Import data from legacy APIS instance"
 
     def handle(self, *args, **options):
-        text_to_entity_mapping = json.loads(
-            pathlib.Path("text_to_entity_mapping.json").read_text()
-        )
+        start = time.perf_counter()
+        text_to_entity_mapping = json.loads(mapping_file.read_text())
 
-        reader = csv.DictReader(
-            pathlib.Path("data/annotations_oebl_export_10-2023.csv").open()
+        # first pass: collect the ids of all the objects we reference
+        person_ids = set()
+        relation_ids = set()
+        project_ids = set()
+        for row in read_rows():
+            if entity_map := text_to_entity_mapping.get(row["text_id"]):
+                person_ids.add(entity_map["entity_id"])
+                if is_person(row):
+                    person_ids.add(int(row["object_id"]))
+                else:
+                    relation_ids.add(int(row["object_id"]))
+                project_ids.add(int(row["annotation_project_id"]))
+
+        users = User.objects.in_bulk(user_mapping.values(), field_name="username")
+        persons = Person.objects.only("pk").in_bulk(person_ids)
+        # the relations keep the ids of the legacy relations, see
+        # `copy_triples_to_ng_relations`, and the annotations refer to
+        # them using the content types of their relation classes
+        relations = {
+            relation.pk: relation
+            for relation in Relation.objects.filter(
+                pk__in=relation_ids
+            ).select_subclasses()
+        }
+        projects = AnnotationProject.objects.in_bulk(project_ids)
+        AnnotationProject.objects.bulk_create(
+            [AnnotationProject(pk=pk) for pk in project_ids - projects.keys()]
         )
-        for row in reader:
-            if row["content_type_id"] and row["object_id"]:
-                ann, _ = Annotation.objects.get_or_create(
-                    pk=row["id"], start=row["start"], end=row["end"]
-                )
-                ann.orig_string = row["orig_string"]
-                try:
-                    user = User.objects.get(
-                        username=user_mapping[int(row["user_added_id"])]
-                    )
-                    ann.user = user
-                except User.DoesNotExist:
-                    pass
-
-                text_id = row["text_id"]
-                entity_map = text_to_entity_mapping.get(text_id, None)
-                if entity_map:
-                    person_id = entity_map["entity_id"]
-                    p = Person.objects.get(pk=person_id)
-                    ann.text_content_object = p
+        projects = AnnotationProject.objects.in_bulk(project_ids)
+
+        # second pass: create the annotations
+        fields = [
+            field.name
+            for field in Annotation._meta.concrete_fields
+            if not field.primary_key
+        ]
+        rows = 0
+        annotations = 0
+        with transaction.atomic():
+            for batch in batched(read_rows(), BATCH_SIZE):
+                anns = []
+                bare = []
+                for row in batch:
+                    rows += 1
+                    ann = Annotation(pk=row["id"], start=row["start"], end=row["end"])
+                    entity_map = text_to_entity_mapping.get(row["text_id"])
+                    if not entity_map:
+                        bare.append(ann)
+                        continue
+                    ann.orig_string = row["orig_string"]
+                    ann.user = users.get(user_mapping[int(row["user_added_id"])])
+
+                    person = persons.get(entity_map["entity_id"])
+                    if person is None:
+                        print(f"Did not find person with id {entity_map['entity_id']}")
+                        continue
+                    ann.text_content_object = person
                     ann.text_field_name = entity_map["field_name"]
 
-                    if row["content_type_id"] == 8:
-                        try:
-                            obj = Person.objects.get(pk=row["object_id"])
-                        except Person.DoesNotExist:
+                    if is_person(row):
+                        obj = persons.get(int(row["object_id"]))
+                        if obj is None:
                             print(f"Did not find person with id {row['object_id']}")
-                            obj = None
                     else:
-                        try:
-                            obj = TempTriple.objects.get(pk=row["object_id"])
-                        except TempTriple.DoesNotExist:
-                            print(f"Did not find temptriple with id {row['object_id']}")
-                            obj = None
+                        obj = relations.get(int(row["object_id"]))
+                        if obj is None:
+                            print(f"Did not find relation with id {row['object_id']}")
                     if obj:
-                        print(obj)
                         ann.content_object = obj
 
-                    project, _ = AnnotationProject.objects.get_or_create(
-                        pk=row["annotation_project_id"]
-                    )
-                    ann.project = project
-                    ann.save()
+                    ann.project = projects[int(row["annotation_project_id"])]
+                    anns.append(ann)
+                # annotations of texts we did not import are created
+                # without any data, but existing ones are left alone
+                Annotation.objects.bulk_create(bare, ignore_conflicts=True)
+                Annotation.objects.bulk_create(
+                    anns,
+                    update_conflicts=True,
+                    unique_fields=["id"],
+                    update_fields=fields,
+                )
+                annotations += len(anns)
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f"Imported {annotations} annotations from {rows} rows in "
+            f"{duration:.1f}s ({rows / duration:.0f} rows/s)"
+        )
@@ -0,0 +1,62 @@
+"""
+Benchmark rendering the results of the person autocomplete, once
+reversing the detail url of every result, like `LegacyStuffMixin.uri`
+did before, and once joining the primary key with the url parts that
+are computed once per model. The benchmark creates its own persons in
+a transaction that is rolled back at the end and loads them before
+timing, so only the rendering is measured.
+"""
+
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import get_template
+from django.urls import reverse
+
+from apis_ontology.management.commands.benchmark_person_filters import (
+    create_persons,
+    median_ms,
+)
+from apis_ontology.models import Person
+from apis_ontology.querysets import PERSON_AUTOCOMPLETE_FIELDS
+
+TEMPLATE = "apis_ontology/person_autocomplete_result.html"
+
+
+def reversed_uri(self):
+    contenttype = ContentType.objects.get_for_model(self)
+    return reverse("apis_core:generic:detail", args=[contenttype, self.pk])
+
+
+class Command(BaseCommand):
+    help = "Benchmark rendering the results of the person autocomplete"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--persons", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        template = get_template(TEMPLATE)
+        with transaction.atomic():
+            created = create_persons(options["persons"], [], per_person=0)
+            persons = list(
+                Person.objects.filter(pk__in=[person.pk for person in created])
+                .select_related("professioncategory")
+                .only(*PERSON_AUTOCOMPLETE_FIELDS)
+            )
+            self.stdout.write(f"Created {len(persons)} persons")
+
+            def render():
+                for person in persons:
+                    template.render({"result": person})
+
+            # warm the content type cache and the url parts
+            render()
+            with mock.patch.object(Person, "uri", property(reversed_uri)):
+                duration = median_ms(render, options["repeat"])
+            self.stdout.write(f"reverse per result: {duration:.2f} ms")
+            duration = median_ms(render, options["repeat"])
+            self.stdout.write(f"url parts per model: {duration:.2f} ms")
+            transaction.set_rollback(True)
@@ -0,0 +1,101 @@
+"""
+Benchmark filtering the persons of the API by their professions, once
+joining the professions and removing the duplicates with `.distinct()`,
+like the API did before, and once using the `pk__in` subqueries of the
+`SubqueryModelMultipleChoiceFilter`. The benchmark creates its own
+persons in a transaction that is rolled back at the end, so it can be
+run against a copy of the production database or an empty one.
+"""
+
+import random
+import statistics
+import time
+from itertools import batched
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django_filters.filterset import filterset_factory
+
+from apis_core.apis_metainfo.models import RootObject
+from apis_ontology.filtersets import PersonFilterSet
+from apis_ontology.legacy import bulk_create_inherited
+from apis_ontology.models import Person, Profession
+from apis_ontology.querysets import PersonViewSetQueryset
+
+
+def create_persons(count, professions, per_person=2, seed=0):
+    """
+    Create `count` persons with `per_person` random professions each,
+    in bulk, and return them.
+    """
+    rng = random.Random(seed)
+    start = (RootObject.objects.aggregate(Max("pk"))["pk__max"] or 0) + 1
+    persons = [
+        Person(pk=pk, forename=f"Vorname {pk}", surname=f"Nachname {pk}")
+        for pk in range(start, start + count)
+    ]
+    through = Person.profession.through
+    for batch in batched(persons, 5000):
+        bulk_create_inherited(Person, batch)
+        through.objects.bulk_create(
+            [
+                through(person_id=person.pk, profession_id=profession.pk)
+                for person in batch
+                for profession in rng.sample(professions, per_person)
+            ]
+        )
+    return persons
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark filtering the persons of the API by their professions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--persons", type=int, default=100_000)
+        parser.add_argument("--professions", type=int, default=100)
+        parser.add_argument("--filter", type=int, default=3, dest="selected")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            professions = Profession.objects.bulk_create(
+                [
+                    Profession(name=f"Benchmark {i}")
+                    for i in range(options["professions"])
+                ]
+            )
+            create_persons(options["persons"], professions)
+            self.stdout.write(f"Created {options['persons']} persons")
+
+            value = [profession.pk for profession in professions[: options["selected"]]]
+            filterset_class = filterset_factory(Person, PersonFilterSet)
+            querysets = {
+                "join and distinct": PersonViewSetQueryset()
+                .filter(profession__in=value)
+                .distinct(),
+                "subquery": filterset_class(
+                    {"profession": value}, PersonViewSetQueryset()
+                ).qs,
+            }
+            for name, queryset in querysets.items():
+                # a page of the API counts the results and loads one page
+                duration = median_ms(
+                    lambda: (
+                        queryset.count(),
+                        list(queryset.order_by("pk")[: options["page_size"]]),
+                    ),
+                    options["repeat"],
+                )
+                self.stdout.write(f"{name}: {duration:.1f} ms")
+            transaction.set_rollback(True)
@@ -1,146 +1,299 @@
+import datetime
+import json
 import logging
+import pathlib
+from collections import defaultdict
 from functools import cache
-from typing import Literal
+from itertools import batched, islice
+from typing import Literal, get_args
 
 import requests
-from apis_highlighter.models import Annotation, AnnotationProject
-from django.contrib.contenttypes.models import ContentType
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
 
-import apis_ontology.models as ontology_models
-from apis_core.apis_relations.models import TempTriple
-
-logging.basicConfig(
-    filename="relation_creation.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+from apis_core.relations.models import Relation
+from apis_ontology.api_views import RELATION_TYPES_CACHE_KEY
+from apis_ontology.legacy import (
+    SRC,
+    RevisionIndex,
+    bulk_create_inherited,
+    bulk_history_create,
+    fetch_pages,
+    iter_json_items,
+    relations_file,
+    resolve_objects,
 )
+from apis_ontology.models import CacheVersion, TempTripleLegacyAttributes
+from apis_ontology.network import person_relation_models, update_relation_edges
+
 logger = logging.getLogger(__name__)
 
 
+Vocabulary = Literal[
+    "personplace",
+    "personinstitution",
+    "personevent",
+    "personwork",
+    "personperson",
+    "institutionplace",
+    "institutionwork",
+    "institutionevent",
+    "institutioninstitution",
+    "eventwork",
+    "eventevent",
+    "placeevent",
+    "placework",
+    "placeplace",
+    "workwork",
+]
+
+
+@cache
+def relation_vocabulary(vocab: Vocabulary):
+    """
+    Download a relation vocabulary of the vanilla API once and return
+    its terms by id, together with an index of the term ids by name
+    and by reverse name.
+    """
+    terms = {}
+    names = {"name": defaultdict(list), "name_reverse": defaultdict(list)}
+    for data in fetch_pages(f"{SRC}/vocabularies/{vocab}relation/"):
+        for result in data["results"]:
+            terms[result["id"]] = result
+            for field, index in names.items():
+                index[result[field]].append(result["id"])
+    return terms, names
+
+
+def vocabulary_labels(terms, term_id):
+    """
+    Return the label and the reverse label of a term, prefixed with
+    the labels of its parents.
+    """
+    if term_id not in terms:
+        logger.warning(f"no matches found for {term_id} in vanilla API")
+        return None, None
+    term = terms[term_id]
+    label = term["name"]
+    label_reverse = term["name_reverse"]
+    if parent := term.get("parent_class"):
+        res_2, res_2_reverse = vocabulary_labels(terms, parent["id"])
+        label = f"{res_2} >> {label}"
+        label_reverse = f"{res_2_reverse} >> {label_reverse}"
+    return label, label_reverse
+
+
 @cache
 def fetch_relation_from_api(
     term: str,
-    vocab: Literal[
-        "personplace",
-        "personinstitution",
-        "personevent",
-        "personwork",
-        "personperson",
-        "institutionplace",
-        "institutionwork",
-        "institutionevent",
-        "institutioninstitution",
-        "eventwork",
-        "eventevent",
-        "placeevent",
-        "placework",
-        "placeplace",
-        "workwork",
-    ],
+    vocab: Vocabulary,
     field: Literal["name", "name_reverse"] = "name",
 ):
     if "PIO" in term:
         return None, None
     try:
-        term = int(term)
-        query = {"id": term, "format": "json"}
-    except ValueError:
-        query = {field: term, "format": "json"}
-    url = f"https://apis.acdh.oeaw.ac.at/apis/api/vocabularies/{vocab}relation/"
-    try:
-        response = requests.get(url, params=query)
-        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-
-        if response.status_code == 200:
-            data = response.json()
-            if data["count"] == 1:
-                label = data["results"][0]["name"]
-                label_reverse = data["results"][0]["name_reverse"]
-                result = data["results"][0].get("parent_class")
-                if result:
-                    res_2, res_2_reverse = fetch_relation_from_api(
-                        str(result["id"]), vocab, field
-                    )
-                    label = f"{res_2} >> {label}"
-                    label_reverse = f"{res_2_reverse} >> {label_reverse}"
-                return label, label_reverse
-            else:
-                logger.warning(f"got {data['count']} results for query")
-        logger.warning(f"no matches found for {term} in vanilla API")
-        return None, None  # Return None if no matches found or empty response
+        terms, names = relation_vocabulary(vocab)
     except requests.RequestException as e:
         print(f"Error querying API: {e}")
         logger.error(f"call to vanilla API did not return 200 for {term} to {vocab}")
         return None, None
+    try:
+        term_ids = [int(term)]
+    except ValueError:
+        term_ids = names[field].get(term, [])
+        if len(term_ids) != 1:
+            logger.warning(f"got {len(term_ids)} results for query")
+            logger.warning(f"no matches found for {term} in vanilla API")
+            return None, None
+    return vocabulary_labels(terms, term_ids[0])
+
+
+checkpoint_file = pathlib.Path("copy_triples_checkpoint.json")
+
+# the date of the history of relations without a revision
+LEGACY_HISTORY_DATE = datetime.datetime(2017, 12, 31)
+
+COPYFIELDS = ["review", "status", "references", "notes"]
+
+
+def legacy_relation_classes():
+    """
+    The relation classes that were created from properties of the
+    legacy instance, by name, subject model and object model.
+    """
+    return {
+        (model.name(), model.subj_model, model.obj_model): model
+        for model in apps.get_app_config("apis_ontology").get_models()
+        if issubclass(model, Relation) and hasattr(model, "_legacy_property_id")
+    }
+
+
+def relation_instance(id, relation, objects, relation_classes):
+    """
+    Create an (unsaved) instance of the relation class of a legacy
+    relation. Relations of a property that has its own relation class
+    use that class, all the others use the legacy relation class of
+    their type, with the labels of their term in the legacy vocabulary.
+    """
+    subj, subj_content_type = objects.get(relation["subj"], (None, None))
+    obj, obj_content_type = objects.get(relation["obj"], (None, None))
+    if subj is None or obj is None:
+        logger.warning(f"subject or object of relation {id} not found")
+        return None
+    attributes = {}
+    key = (relation["name"], type(subj), type(obj))
+    if key in relation_classes:
+        rel_class = relation_classes[key]
+    else:
+        try:
+            rel_class = apps.get_model(
+                "apis_ontology", f"{relation['type']}legacyrelation"
+            )
+        except LookupError:
+            logger.warning(f"couldnt find class to use for {relation['type']}")
+            return None
+        label, label_reverse = fetch_relation_from_api(
+            relation["name"], relation["type"], "name"
+        )
+        attributes["legacy_relation_vocab_label"] = label
+        attributes["legacy_relation_vocab_label_reverse"] = label_reverse
+    if type(subj) is not rel_class.subj_model or type(obj) is not rel_class.obj_model:
+        logger.warning(f"{subj} and {obj} can not be related by {rel_class.__name__}")
+        return None
+
+    instance = rel_class(
+        id=int(id),
+        relation_ptr_id=int(id),
+        subj_content_type=subj_content_type,
+        subj_object_id=subj.pk,
+        obj_content_type=obj_content_type,
+        obj_object_id=obj.pk,
+        start=relation["start_date_written"],
+        end=relation["end_date_written"],
+        **{field: relation[field] for field in COPYFIELDS},
+        **attributes,
+    )
+    # the instances are saved in bulk, which does not call `pre_save`,
+    # but we need it to populate the date fields of the `FuzzyDateParserField`s
+    try:
+        for field in rel_class._meta.concrete_fields:
+            setattr(instance, field.attname, field.pre_save(instance, True))
+    except ValidationError as e:
+        logger.warning(f"could not parse the dates of relation {id}: {e}")
+        return None
+    return instance
+
+
+def copy_relations(chunk, relation_classes, revisions, users):
+    """
+    Copy a chunk of legacy relations to the relation classes. The
+    relations keep the ids of the legacy instance, so existing relations
+    are updated. The relations of every class are written in bulk, so
+    no signals are sent; instead, the version of the relation types and
+    the edges of the relations between persons are updated once per
+    chunk. Returns the number of copied relations.
+    """
+    objects = resolve_objects(
+        {relation[key] for _, relation in chunk for key in ["subj", "obj"]} - {None}
+    )
+    existing = {
+        relation.pk: relation
+        for relation in Relation.objects.filter(
+            pk__in=[int(id) for id, _ in chunk]
+        ).select_subclasses()
+    }
+    instances = defaultdict(list)
+    for id, relation in chunk:
+        instance = relation_instance(id, relation, objects, relation_classes)
+        if instance is None:
+            continue
+        current = existing.get(instance.pk)
+        if current is not None and type(current) is not type(instance):
+            logger.warning(f"relation {id} already exists as {type(current).__name__}")
+            continue
+        instance._history_date = LEGACY_HISTORY_DATE
+        if revision := revisions.get(relation["type"], id):
+            instance._history_date = datetime.datetime.fromisoformat(
+                revision["timestamp"]
+            )
+            if revision["user"] is not None:
+                instance._history_user = users[revision["user"]]
+        instances[type(instance)].append(instance)
+
+    for model, group in instances.items():
+        created = [instance for instance in group if instance.pk not in existing]
+        updated = [instance for instance in group if instance.pk in existing]
+        bulk_create_inherited(model, created)
+        model.objects.bulk_update(
+            updated,
+            [
+                field.name
+                for field in model._meta.concrete_fields
+                if not field.primary_key
+            ],
+        )
+        bulk_history_create(model, created)
+        bulk_history_create(model, updated, update=True)
+        if model in person_relation_models():
+            update_relation_edges(
+                model.objects.filter(pk__in=[instance.pk for instance in group])
+            )
+    # the `possible_types` of the relation types are
+    # based on the labels of the legacy relations
+    if any(issubclass(model, TempTripleLegacyAttributes) for model in instances):
+        CacheVersion.increment_on_commit(RELATION_TYPES_CACHE_KEY)
+    return sum(len(group) for group in instances.values())
 
 
 class Command(BaseCommand):
-    help = "Run through existing relations and create ng relation instances from the triples."
+    help = "Create the relations of the legacy instance from the downloaded legacy relations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
 
     def handle(self, *args, **options):
-        classes = [
-            cls
-            for name, cls in ontology_models.__dict__.items()
-            if isinstance(cls, type)
-        ]
-        ann_projects_new = dict()
-        relation_class_names = [cls.__name__ for cls in classes]
-        relation_classes = {
-            cls._legacy_property_id: cls
-            for cls in classes
-            if hasattr(cls, "_legacy_property_id")
-        }
-        triple_content_type = ContentType.objects.get_for_model(TempTriple)
-        for temptriple in TempTriple.objects.all().order_by("prop"):
-            attributes = {
-                field.name: getattr(temptriple, field.name)
-                for field in TempTriple._meta.fields
-                if field.name not in ["prop", "id", "pk", "triple_ptr"]
-            }
-            if temptriple.prop_id in relation_classes:
-                rel_class = relation_classes[temptriple.prop_id]
-            else:
-                opt_a = f"{temptriple.subj.__class__.__name__.title()}{temptriple.obj.__class__.__name__.title()}"
-                opt_b = f"{temptriple.obj.__class__.__name__.title()}{temptriple.subj.__class__.__name__.title()}"
-                if f"{opt_a}LegacyRelation" in relation_class_names:
-                    rel_class = getattr(ontology_models, f"{opt_a}LegacyRelation")
-                    vocab = opt_a.lower()
-                    field = "name"
-                elif f"{opt_b}LegacyRelation" in relation_class_names:
-                    rel_class = getattr(ontology_models, f"{opt_b}LegacyRelation")
-                    vocab = opt_b.lower()
-                    field = "name_reverse"
-                else:
-                    logger.warning(f"couldnt find class to use for {opt_a} / {opt_b}")
-                    continue
-                vocab_label_vanilla, vocab_label_vanilla_reverse = (
-                    fetch_relation_from_api(temptriple.prop.name_forward, vocab, field)
-                )
-                attributes["legacy_relation_vocab_label"] = vocab_label_vanilla
-                attributes["legacy_relation_vocab_label_reverse"] = (
-                    vocab_label_vanilla_reverse
-                )
-            new_rel = rel_class.objects.create(**attributes)
-            for ann in Annotation.objects.filter(
-                content_type=triple_content_type, object_id=temptriple.id
-            ):
-                if ann.project_id in ann_projects_new:
-                    ann_proj = ann_projects_new[ann.project_id]
-                else:
-                    ann_proj = AnnotationProject.objects.create(
-                        name=f"{ann.project.name}-ng"
-                    )
-                    ann_projects_new[ann.project_id] = ann_proj
-                # Create new annotation by copying the old one
-                ann_new = Annotation()
-                ann_new.__dict__.update(ann.__dict__)
-
-                # Clear primary key and specific fields
-                ann_new.pk = None
-                ann_new.id = None
-                ann_new.content_object = new_rel
-                ann_new.project = ann_proj
-
-                # Save the new instance
-                ann_new.save()
+        logging.basicConfig(
+            filename="relation_creation.log",
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+        )
+        relation_classes = legacy_relation_classes()
+        revisions = RevisionIndex()
+        users = {}
+        for username in revisions.users:
+            users[username], _ = User.objects.get_or_create(username=username)
+        # download the vocabularies up front, so the labels of the legacy
+        # relations are resolved in memory
+        for vocab in get_args(Vocabulary):
+            relation_vocabulary(vocab)
+
+        # The relations are copied in chunks, each in its own transaction.
+        # The number of copied relations is stored in a checkpoint file, so
+        # an interrupted run continues after the last completed chunk
+        position = 0
+        if checkpoint_file.exists():
+            position = json.loads(checkpoint_file.read_text())["position"]
+            logger.info(f"resuming after relation {position}")
+
+        relations = islice(iter_json_items(relations_file), position, None)
+        for chunk in batched(relations, options["chunk_size"]):
+            with transaction.atomic():
+                copied = copy_relations(chunk, relation_classes, revisions, users)
+            # the checkpoint is only moved past the chunk once
+            # the transaction of the chunk was committed
+            position += len(chunk)
+            checkpoint_file.write_text(json.dumps({"position": position}))
+            self.stdout.write(
+                f"Copied {copied} of {len(chunk)} relations up to {position}"
+            )
+
+        # the relations were inserted with their legacy ids, so the
+        # sequence of the relation ids has to be moved past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Relation]):
+                cursor.execute(sql)
+        checkpoint_file.unlink(missing_ok=True)
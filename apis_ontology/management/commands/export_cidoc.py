@@ -0,0 +1,91 @@
+import gzip
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from multiprocessing import get_context
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apis_ontology.exports import (
+    FORMATS,
+    export_models,
+    serialize_model,
+    serialize_model_to_file,
+)
+
+
+class Command(BaseCommand):
+    help = "Export persons, institutions, places and person-institution relations as CIDOC CRM"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to, defaults to stdout",
+        )
+        parser.add_argument("--format", choices=FORMATS.keys(), default="nt")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Serialize the models in parallel using this many processes",
+        )
+
+    def open_output(self, stack, options):
+        if options["output"] == "-":
+            output = sys.stdout.buffer
+        else:
+            output = stack.enter_context(open(options["output"], "wb"))
+        if options["gzip"]:
+            output = stack.enter_context(gzip.GzipFile(fileobj=output, mode="wb"))
+        return output
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            output = self.open_output(stack, options)
+            self.export(output, options)
+            output.flush()
+
+    def export(self, output, options):
+        rdf_format = FORMATS[options["format"]]
+        chunk_size = options["chunk_size"]
+        models = export_models()
+
+        if options["workers"] > 1:
+            # the worker processes are forked and must not share
+            # the database connections of this process
+            connections.close_all()
+            with (
+                tempfile.TemporaryDirectory() as tmpdir,
+                ProcessPoolExecutor(
+                    options["workers"], mp_context=get_context("fork")
+                ) as pool,
+            ):
+                parts = [Path(tmpdir) / f"{model._meta.label}.part" for model in models]
+                futures = [
+                    pool.submit(
+                        serialize_model_to_file,
+                        model._meta.label,
+                        part,
+                        rdf_format,
+                        chunk_size,
+                    )
+                    for model, part in zip(models, parts)
+                ]
+                # the parts are written in the order of the models,
+                # so the output does not depend on the scheduling
+                for model, future, part in zip(models, futures, parts):
+                    count = future.result()
+                    with open(part, "rb") as part_file:
+                        shutil.copyfileobj(part_file, output)
+                    self.stderr.write(f"Exported {count} {model._meta.label} instances")
+        else:
+            for model in models:
+                count = serialize_model(model, output, rdf_format, chunk_size)
+                self.stderr.write(f"Exported {count} {model._meta.label} instances")
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from multiprocessing import get_context
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apis_ontology.exports import merge_shards, relation_models, serialize_shard
+
+
+class Command(BaseCommand):
+    help = "Export the person-institution relations as sorted, deduplicated CIDOC CRM N-Triples"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to, defaults to stdout",
+        )
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument(
+            "--partition-size",
+            type=int,
+            default=10000,
+            help="Number of relations serialized by one worker task",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def partitions(self, partition_size):
+        for model in relation_models():
+            ids = list(model.objects.order_by("pk").values_list("pk", flat=True))
+            for start in range(0, len(ids), partition_size):
+                yield model._meta.label, ids[start : start + partition_size]
+
+    def handle(self, *args, **options):
+        partitions = list(self.partitions(options["partition_size"]))
+        # the worker processes are forked and must not share
+        # the database connections of this process
+        connections.close_all()
+        with ExitStack() as stack:
+            tmpdir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            pool = stack.enter_context(
+                ProcessPoolExecutor(options["workers"], mp_context=get_context("fork"))
+            )
+            shards = [tmpdir / f"{i:06}.nt" for i in range(len(partitions))]
+            futures = [
+                pool.submit(serialize_shard, label, ids, shard, options["chunk_size"])
+                for (label, ids), shard in zip(partitions, shards)
+            ]
+            count = sum(future.result() for future in futures)
+            self.stderr.write(f"Serialized {count} relations to {len(shards)} shards")
+
+            if options["output"] == "-":
+                output = sys.stdout.buffer
+            else:
+                output = stack.enter_context(open(options["output"], "wb"))
+            merge_shards(shards, output)
+            output.flush()
@@ -1,19 +1,32 @@
+import cProfile
 import csv
 import datetime
+import io
 import json
-import os
 import pathlib
+import pstats
 import re
 from collections import defaultdict
 
-import requests
 from apis_highlighter.models import AnnotationProject
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
 
-from apis_core.apis_metainfo.models import Uri
 from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
+from apis_core.uris.models import Uri
+from apis_ontology.legacy import (
+    SRC,
+    RevisionIndex,
+    bulk_history_create,
+    fetch_pages,
+    load_texts,
+    resolve_objects,
+    shared_session,
+    write_json_items,
+)
 from apis_ontology.models import (
     Event,
     Institution,
@@ -25,27 +38,19 @@ from apis_ontology.models import (
     Title,
     Work,
 )
+from apis_ontology.search import update_person_search_documents
 
-SRC = "https://apis.acdh.oeaw.ac.at/apis/api"
-
-
-TOKEN = os.environ.get("TOKEN")
-HEADERS = {"Authorization": f"Token {TOKEN}"}
+PAGE_SIZE = 1000
 
 texts_file = pathlib.Path("texts.json")
 sources_file = pathlib.Path("sources.json")
 uris_file = pathlib.Path("uris.json")
+checkpoint_file = pathlib.Path("import_checkpoint.json")
+pages_file = pathlib.Path("import_pages.jsonl")
 
 
-def create_texts_file():
-    texts = dict()
-    nextpage = f"{SRC}/metainfo/text/?format=json&limit=5000"
-    s = requests.Session()
-    while nextpage:
-        print(nextpage)
-        page = s.get(nextpage, headers=HEADERS)
-        data = page.json()
-        nextpage = data["next"]
+def fetch_texts():
+    for data in fetch_pages(f"{SRC}/metainfo/text/", limit=5000):
         for result in data["results"]:
             ttype = None
             if result["kind"] is not None:
@@ -65,43 +70,36 @@ def create_texts_file():
                 "Commentary Staribacher",
                 None,
             ]:
-                texts[result["id"]] = {"text": result["text"], "type": ttype}
-    texts_file.write_text(json.dumps(texts, indent=2))
+                yield result["id"], {"text": result["text"], "type": ttype}
 
 
-def create_sources_file():
-    sources = dict()
-
-    nextpage = f"{SRC}/metainfo/source/?format=json&limit=5000"
-    s = requests.Session()
-    while nextpage:
-        print(nextpage)
-        page = s.get(nextpage, headers=HEADERS)
-        data = page.json()
-        nextpage = data["next"]
+def create_texts_file():
+    write_json_items(texts_file, fetch_texts())
+
+
+def fetch_sources():
+    for data in fetch_pages(f"{SRC}/metainfo/source/", limit=5000):
         for result in data["results"]:
             if result["pubinfo"] == "\u00d6BL 1815-1950, Bd. 1 (Lfg. 2), S. 112f.":
                 result["pubinfo"] = "\u00d6BL 1815-1950, Bd. 1 (Lfg. 2, 1954), S. 112f."
             if result["pubinfo"] == "\u00d6BL 1815-1950, Bd. 6 (Lfg. 27), S. 126":
                 result["pubinfo"] = "\u00d6BL 1815-1950, Bd. 6 (Lfg. 27, 1974), S. 126"
-            sources[result["id"]] = {
-                "orig_filename": result["orig_filename"],
-                "pubinfo": result["pubinfo"],
-                "author": result["author"],
-            }
-    sources_file.write_text(json.dumps(sources, indent=2))
+            yield (
+                result["id"],
+                {
+                    "orig_filename": result["orig_filename"],
+                    "pubinfo": result["pubinfo"],
+                    "author": result["author"],
+                },
+            )
 
 
-def create_uris_file():
-    uris = dict()
-
-    nextpage = f"{SRC}/metainfo/uri/?format=json&limit=5000"
-    s = requests.Session()
-    while nextpage:
-        print(nextpage)
-        page = s.get(nextpage, headers=HEADERS)
-        data = page.json()
-        nextpage = data["next"]
+def create_sources_file():
+    write_json_items(sources_file, fetch_sources())
+
+
+def fetch_uris():
+    for data in fetch_pages(f"{SRC}/metainfo/uri/", limit=5000):
         for result in data["results"]:
             if result["uri"] == "https://apis-edits.acdh-dev.oeaw.ac.at/entity/None/":
                 continue
@@ -111,17 +109,15 @@ def create_uris_file():
             uri_id = result.pop("id")
             if entity := result.get("entity"):
                 result["entity"] = entity["id"]
-            uris[uri_id] = result
-    uris_file.write_text(json.dumps(uris, indent=2))
+            yield uri_id, result
+
+
+def create_uris_file():
+    write_json_items(uris_file, fetch_uris())
 
 
 def import_professions():
-    nextpage = f"{SRC}/vocabularies/professiontype/?format=json&limit=1000"
-    while nextpage:
-        print(nextpage)
-        page = requests.get(nextpage, headers=HEADERS)
-        data = page.json()
-        nextpage = data["next"]
+    for data in fetch_pages(f"{SRC}/vocabularies/professiontype/"):
         for result in data["results"]:
             tokens = re.split(r" und |,", result["name"])
             for pos, token in enumerate(tokens):
@@ -157,153 +153,309 @@ def import_professions():
                 professioncat.save()
 
 
-def is_entity(revision_tuple, rel_id, rel_type):
-    rev_id, revision = revision_tuple
-    return rev_id == rel_id and revision["model"] == rel_type
+def profession_index():
+    """
+    Map the ids of the professions in the legacy instance to the
+    professions they were merged into (see `import_professions`).
+    """
+    index = {}
+    for profession in Profession.objects.exclude(oldids__isnull=True):
+        for oldid in profession.oldids.splitlines():
+            index.setdefault(int(oldid), []).append(profession)
+    return index
+
+
+def load_checkpoint():
+    """
+    Load the offsets of an interrupted import from the checkpoint file.
+    The data collected from the pages is appended to `pages_file`, which
+    is cut back to the size it had when the checkpoint was written, so
+    the pages that are imported again are not recorded twice.
+    """
+    if checkpoint_file.exists():
+        print(f"Resuming import from {checkpoint_file}")
+        checkpoint = json.loads(checkpoint_file.read_text())
+        with pages_file.open("ab") as f:
+            f.truncate(checkpoint["pages_size"])
+        return checkpoint
+    pages_file.write_text("")
+    return {"offsets": {}, "pages_size": 0}
+
+
+def save_checkpoint(checkpoint, page):
+    with pages_file.open("a") as f:
+        f.write(json.dumps(page) + "\n")
+    checkpoint["pages_size"] = pages_file.stat().st_size
+    tmp = checkpoint_file.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint))
+    tmp.replace(checkpoint_file)
+
+
+def load_pages():
+    """
+    Merge the data collected from all the pages in `pages_file`
+    """
+    merged = {
+        "result_ids": set(),
+        "sources": {},
+        "collections": defaultdict(list),
+        "titles": defaultdict(list),
+        "text_to_entity_mapping": {},
+    }
+    with pages_file.open() as f:
+        for line in f:
+            page = json.loads(line)
+            merged["result_ids"].update(page["result_ids"])
+            merged["sources"].update(page["sources"])
+            merged["text_to_entity_mapping"].update(page["text_to_entity_mapping"])
+            for key in ["collections", "titles"]:
+                for name, values in page[key].items():
+                    merged[key][name].extend(values)
+    return merged
+
+
+def save_entities(entitymodel, instances, existing, professions):
+    """
+    Save a page of entities. Entities that already exist are updated
+    using `bulk_update`. The entity models use multi table inheritance,
+    which `bulk_create` does not support, so new entities are saved one
+    by one. The history of all the entities is written in bulk once their
+    professions are set, so it contains the many to many fields, like the
+    history written by `save` (see `legacy.bulk_history_create`).
+    """
+    fields = [
+        field
+        for field in entitymodel._meta.concrete_fields
+        if not field.primary_key and not field.is_relation
+    ] + [
+        field
+        for field in entitymodel._meta.concrete_fields
+        if field.many_to_one and not field.primary_key
+    ]
+    updated = [instance for instance in instances if instance.pk in existing]
+    for instance in updated:
+        # `bulk_update` does not call `pre_save`, but we need it to
+        # populate the date fields of the `FuzzyDateParserField`s and
+        # the `display_name` of persons
+        for field in fields:
+            setattr(instance, field.attname, field.pre_save(instance, False))
+    entitymodel.objects.bulk_update(updated, [field.name for field in fields])
+    created = [instance for instance in instances if instance.pk not in existing]
+    for instance in created:
+        instance.skip_history_when_saving = True
+        instance.save()
+        del instance.skip_history_when_saving
+
+    if professions:
+        through = entitymodel.profession.through
+        through.objects.bulk_create(
+            [
+                through(person_id=person_id, profession_id=profession_id)
+                for person_id, profession_id in professions
+            ],
+            ignore_conflicts=True,
+        )
+
+    bulk_history_create(entitymodel, created)
+    bulk_history_create(entitymodel, updated, update=True)
+
+
+def import_entity_page(
+    entitymodel,
+    results,
+    texts,
+    revisions,
+    user_cache,
+    professioncategory_cache,
+    profession_cache,
+):
+    """
+    Import a page of entities and return the data of the page that is
+    needed once all the entities are imported.
+    """
+    entity = entitymodel.__name__.lower()
+    content_type = ContentType.objects.get_for_model(entitymodel)
+    existing = entitymodel.objects.in_bulk([result["id"] for result in results])
+    instances = []
+    professions = []
+    page = {
+        "result_ids": [],
+        "sources": {},
+        "collections": {},
+        "titles": {},
+        "text_to_entity_mapping": {},
+    }
+    for result in results:
+        print(result["url"])
+        if entitymodel is Person:
+            result["surname"] = result["name"]
+            result["forename"] = result["first_name"]
+        if entitymodel == Place:
+            result["label"] = result["name"]
+        result_id = result["id"]
+        page["result_ids"].append(result_id)
+        if "kind" in result and result["kind"] is not None:
+            result["kind"] = result["kind"]["label"]
+
+        professionlist = []
+        professioncategory = None
+        if "profession" in result:
+            for profession in result["profession"]:
+                profession_id = int(profession["id"])
+                if profession_id in professioncategory_cache:
+                    professioncategory = professioncategory_cache[profession_id]
+                else:
+                    professionlist.extend(profession_cache.get(profession_id, []))
+            del result["profession"]
+
+        if "title" in result:
+            for title in result["title"]:
+                page["titles"].setdefault(title, []).append(result_id)
+            del result["title"]
+
+        newentity = existing.get(result_id) or entitymodel(pk=result_id)
+        for attribute in result:
+            if hasattr(newentity, attribute):
+                setattr(newentity, attribute, result[attribute])
+
+        if result["source"] is not None:
+            if "id" in result["source"]:
+                page["sources"][str(result["source"]["id"])] = [
+                    content_type.id,
+                    newentity.id,
+                ]
+
+        textids = [str(text["id"]) for text in result["text"]]
+        entity_texts = {key: texts[key] for key in textids if key in texts}
+        for key, entity_text in entity_texts.items():
+            done = False
+            text_type = entity_text["type"]
+            for field in newentity._meta.fields:
+                if field.verbose_name == text_type or field.name == text_type.lower():
+                    setattr(newentity, field.name, entity_text["text"])
+                    done = True
+                    page["text_to_entity_mapping"][key] = {
+                        "entity_id": newentity.id,
+                        "field_name": field.name,
+                    }
+            if not done:
+                print(f"Could not save text: {entity_text}")
+
+        # set up versions
+        newentity._history_date = datetime.datetime(2017, 12, 31)
+        if revision := revisions.get(entity, result_id):
+            timestamp = datetime.datetime.fromisoformat(revision["timestamp"])
+            newentity._history_date = timestamp
+            if revision.get("user") is not None:
+                newentity._history_user = user_cache[revision["user"]]
+
+        if professioncategory:
+            newentity.professioncategory = professioncategory
+        professions.extend(
+            (newentity.pk, profession.pk) for profession in professionlist
+        )
+
+        if "collection" in result:
+            for collection in result["collection"]:
+                page["collections"].setdefault(collection["label"], []).append(
+                    (content_type.id, newentity.id)
+                )
+        instances.append(newentity)
+
+    with transaction.atomic():
+        # 2024 and 2014 were tests, lets delete them if they still exist, and
+        # delete the versions we are about to recreate
+        history_dates = Q(history_date__year__in=[2014, 2024])
+        for instance in instances:
+            history_dates |= Q(id=instance.pk, history_date=instance._history_date)
+        entitymodel.history.filter(id__in=existing.keys()).filter(
+            history_dates
+        ).delete()
+
+        save_entities(entitymodel, instances, existing, professions)
+
+        # `bulk_update` does not send `post_save`, which keeps
+        # the search documents of the persons up to date
+        if entitymodel is Person:
+            update_person_search_documents(
+                Person.objects.filter(pk__in=[instance.pk for instance in instances])
+            )
+    return page
+
+
+def import_sources(sources, entities):
+    """
+    Create the sources of the imported entities. `sources` maps the ids
+    of the sources to their fields, `entities` maps the ids of the sources
+    to the content type and the id of the entity they belong to.
+    """
+    fields = ["orig_filename", "pubinfo", "author", "content_type", "object_id"]
+    Source.objects.bulk_create(
+        [
+            Source(
+                pk=int(source_id),
+                content_type_id=content_type_id,
+                object_id=object_id,
+                **sources[source_id],
+            )
+            for source_id, (content_type_id, object_id) in entities.items()
+            if source_id in sources
+        ],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=fields,
+    )
 
 
 def import_entities(entities=[]):
-    texts = json.loads(texts_file.read_text())
-    text_to_entity_mapping = dict()
+    texts = load_texts(texts_file)
     sources = json.loads(sources_file.read_text())
     uris = json.loads(uris_file.read_text())
-    revisions = json.loads(pathlib.Path("data/reversion.json").read_text())
+    revisions = RevisionIndex()
     entities = entities or [Event, Institution, Person, Place, Work]
 
-    professioncategory_cache = ProfessionCategory.objects.all()
-    profession_cache = Profession.objects.all()
-    title_cache = defaultdict(list)
-    collections = defaultdict(list)
-    rev_users = {rev["user"] for revid, rev in revisions.items()}
+    professioncategory_cache = ProfessionCategory.objects.in_bulk()
+    profession_cache = profession_index()
     user_cache = {}
-    for username in rev_users:
-        if username:
-            user_cache[username], _ = User.objects.get_or_create(username=username)
+    for username in revisions.users:
+        user_cache[username], _ = User.objects.get_or_create(username=username)
 
     importcol, created = SkosCollection.objects.get_or_create(
         name="imported collections"
     )
 
-    result_ids = []
+    # The progress of the import is stored in a checkpoint file after
+    # every page, so an interrupted import continues where it stopped
+    checkpoint = load_checkpoint()
+    session = shared_session()
 
     for entitymodel in entities:
         entity = entitymodel.__name__.lower()
-        nextpage = f"{SRC}/entities/{entity}/?format=json&limit=1000"
-        content_type = ContentType.objects.get_for_model(entitymodel)
-        while nextpage:
-            print(nextpage)
-            page = requests.get(nextpage, headers=HEADERS)
-            data = page.json()
-            nextpage = data["next"]
-            for result in data["results"]:
-                print(result["url"])
-                if entitymodel is Person:
-                    result["surname"] = result["name"]
-                    result["forename"] = result["first_name"]
-                if entitymodel == Place:
-                    result["label"] = result["name"]
-                result_id = result["id"]
-                result_ids.append(result_id)
-                if "kind" in result and result["kind"] is not None:
-                    result["kind"] = result["kind"]["label"]
-
-                professionlist = []
-                professioncategory = None
-                if "profession" in result:
-                    for profession in result["profession"]:
-                        if int(profession["id"]) in list(
-                            professioncategory_cache.values_list("id", flat=True)
-                        ):
-                            professioncategory = professioncategory_cache.get(
-                                id=profession["id"]
-                            )
-                        else:
-                            for dbprofession in profession_cache:
-                                if profession["id"] in list(
-                                    map(int, dbprofession.oldids.splitlines())
-                                ):
-                                    professionlist.append(dbprofession)
-                    del result["profession"]
-
-                if "title" in result:
-                    for title in result["title"]:
-                        title_cache[title].append(result_id)
-                    del result["title"]
-
-                newentity, created = entitymodel.objects.get_or_create(pk=result_id)
-                for attribute in result:
-                    if hasattr(newentity, attribute):
-                        setattr(newentity, attribute, result[attribute])
-
-                if result["source"] is not None:
-                    if "id" in result["source"]:
-                        sources[str(result["source"]["id"])]["content_type"] = (
-                            content_type
-                        )
-                        sources[str(result["source"]["id"])]["object_id"] = newentity.id
-
-                textids = [str(text["id"]) for text in result["text"]]
-                entity_texts = {
-                    key: text for key, text in texts.items() if key in textids
-                }
-                for key, entity_text in entity_texts.items():
-                    done = False
-                    text_type = entity_text["type"]
-                    for field in newentity._meta.fields:
-                        if (
-                            field.verbose_name == text_type
-                            or field.name == text_type.lower()
-                        ):
-                            setattr(newentity, field.name, entity_text["text"])
-                            done = True
-                            text_to_entity_mapping[key] = {
-                                "entity_id": newentity.id,
-                                "field_name": field.name,
-                            }
-                    if not done:
-                        print(f"Could not save text: {entity_text}")
-                newentity.save()
-
-                # set up versions
-                # 2024 and 2014 were tests, lets delete them if they still exist
-                newentity.history.filter(history_date__year=2024).delete()
-                newentity.history.filter(history_date__year=2014).delete()
-                newentity._history_date = datetime.datetime(2017, 12, 31)
-                ent_revisions = list(
-                    filter(
-                        lambda x: is_entity(x, str(result_id), entity),
-                        revisions.items(),
-                    )
-                )
-                if ent_revisions:
-                    revid, revision = ent_revisions[0]
-                    timestamp = datetime.datetime.fromisoformat(revision["timestamp"])
-                    newentity._history_date = timestamp
-                    if revision.get("user") is not None:
-                        newentity._history_user = user_cache[revision["user"]]
-                newentity.history.filter(history_date=newentity._history_date).delete()
-
-                if professioncategory:
-                    newentity.professioncategory = professioncategory
-                # this triggers a save()
-                if professionlist:
-                    newentity.profession.add(*professionlist)
-
-                if "collection" in result:
-                    for collection in result["collection"]:
-                        collections[collection["label"]].append(
-                            (content_type.id, newentity.id)
-                        )
+        offset = checkpoint["offsets"].get(entity, 0)
+        for data in fetch_pages(
+            f"{SRC}/entities/{entity}/", session, limit=PAGE_SIZE, offset=offset
+        ):
+            page = import_entity_page(
+                entitymodel,
+                data["results"],
+                texts,
+                revisions,
+                user_cache,
+                professioncategory_cache,
+                profession_cache,
+            )
+            offset += PAGE_SIZE
+            checkpoint["offsets"][entity] = offset
+            save_checkpoint(checkpoint, page)
+
+    pages = load_pages()
+    result_ids = pages["result_ids"]
+    collections = pages["collections"]
+    title_cache = pages["titles"]
+    text_to_entity_mapping = pages["text_to_entity_mapping"]
 
     print("Sources...")
-    for source in sources:
-        if hasattr(source, "content_type"):
-            newsource, _ = Source.objects.get_or_create(pk=source["id"])
-            newsource.content_type = source.pop("content_type")
-            newsource.object_id = source.pop("object_id")
-            for field in source:
-                setattr(newsource, field, source[field])
-            newsource.save()
+    import_sources(sources, pages["sources"])
 
     print("Collections...")
     for collection in collections:
@@ -316,26 +468,41 @@ def import_entities(entities=[]):
             )
 
     print("Titles...")
+    through = Person.title.through
     for title in title_cache:
         newtitle, created = Title.objects.get_or_create(name=title)
-        persons = Person.objects.filter(id__in=title_cache[title])
-        newtitle.person_set.add(persons)
+        through.objects.bulk_create(
+            [
+                through(person_id=person_id, title_id=newtitle.pk)
+                for person_id in title_cache[title]
+            ],
+            ignore_conflicts=True,
+        )
 
     print("Uris...")
-    for uri_id, uri in list(
-        (k, v) for k, v in uris.items() if v["entity"] in result_ids
-    ):
-        # see https://github.com/acdh-oeaw/apis-instance-oebl-pnp/issues/10
-        if uri_id == "60485":
+    # see https://github.com/acdh-oeaw/apis-instance-oebl-pnp/issues/10
+    uris = {
+        uri_id: uri
+        for uri_id, uri in uris.items()
+        if uri["entity"] in result_ids and uri_id != "60485"
+    }
+    objects = resolve_objects({uri["entity"] for uri in uris.values()})
+    for uri_id, uri in uris.items():
+        if uri["entity"] not in objects:
+            print(f"Did not find entity with id {uri['entity']}")
             continue
-        uriobj, _ = Uri.objects.get_or_create(id=uri_id)  # , uri=uri["uri"])
-        for attribute in uri:
-            setattr(uriobj, attribute, uri[attribute])
+        obj, content_type = objects[uri["entity"]]
+        uriobj, _ = Uri.objects.get_or_create(id=uri_id)
+        uriobj.uri = uri["uri"]
+        uriobj.content_type = content_type
+        uriobj.object_id = obj.pk
         uriobj.save()
 
     pathlib.Path("text_to_entity_mapping.json").write_text(
         json.dumps(text_to_entity_mapping, indent=2)
     )
+    checkpoint_file.unlink()
+    pages_file.unlink()
 
 
 def import_annotation_projects():
@@ -358,6 +525,11 @@ class Command(BaseCommand):
         parser.add_argument("--person", action="store_true")
         parser.add_argument("--place", action="store_true")
         parser.add_argument("--work", action="store_true")
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="Profile the entity import and print the most expensive calls",
+        )
 
     def handle(self, *args, **options):
         if not texts_file.exists():
@@ -382,4 +554,14 @@ class Command(BaseCommand):
         if options["work"]:
             entities.append(Work)
 
-        import_entities(entities)
+        if options["profile"]:
+            profiler = cProfile.Profile()
+            profiler.runcall(import_entities, entities)
+            # `self.stderr` ends every write with a newline, so we
+            # let pstats write the report into a buffer first
+            report = io.StringIO()
+            stats = pstats.Stats(profiler, stream=report)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(30)
+            self.stderr.write(report.getvalue(), ending="")
+        else:
+            import_entities(entities)
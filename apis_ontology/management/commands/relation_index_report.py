@@ -0,0 +1,86 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apis_core.relations.models import Relation
+
+STATS_RESET = """
+SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()
+"""
+
+# unique indexes are never reported, they are used to enforce constraints
+UNUSED_INDEXES = """
+SELECT s.relname, s.indexrelname, s.idx_scan, pg_relation_size(s.indexrelid)
+FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid
+WHERE s.relname = ANY(%s) AND s.idx_scan <= %s AND NOT i.indisunique
+ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+SEQUENTIAL_SCANS = """
+SELECT relname, seq_scan, seq_tup_read, coalesce(idx_scan, 0), n_live_tup
+FROM pg_stat_user_tables
+WHERE relname = ANY(%s) AND seq_scan > coalesce(idx_scan, 0) AND n_live_tup >= %s
+ORDER BY seq_tup_read DESC
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Report missing and unused indexes of the relation tables, "
+        "using the statistics of PostgreSQL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-scans",
+            type=int,
+            default=0,
+            help="Report indexes that were used at most this many times",
+        )
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=10000,
+            help="Only report sequential scans of tables with this many rows",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The index statistics are only available on PostgreSQL")
+
+        models = [model for model in apps.get_models() if issubclass(model, Relation)]
+        tables = [model._meta.db_table for model in models]
+
+        with connection.cursor() as cursor:
+            cursor.execute(STATS_RESET)
+            (stats_reset,) = cursor.fetchone()
+            self.stdout.write(f"Statistics collected since {stats_reset or 'ever'}")
+
+            # indexes that are defined in the models, but not in the database,
+            # i.e. because the migrations were not applied
+            self.stdout.write("\nMissing indexes:")
+            for model in models:
+                table = model._meta.db_table
+                constraints = connection.introspection.get_constraints(cursor, table)
+                existing = {name for name, c in constraints.items() if c["index"]}
+                for index in model._meta.indexes:
+                    if index.name not in existing:
+                        fields = ", ".join(index.fields)
+                        self.stdout.write(f"  {table}: {index.name} ({fields})")
+
+            # tables that are scanned sequentially more often than using
+            # an index are probably missing an index for some query
+            self.stdout.write("\nTables mostly read using sequential scans:")
+            cursor.execute(SEQUENTIAL_SCANS, [tables, options["min_rows"]])
+            for table, seq_scan, seq_tup_read, idx_scan, rows in cursor.fetchall():
+                self.stdout.write(
+                    f"  {table}: {seq_scan} sequential scans reading "
+                    f"{seq_tup_read} rows, {idx_scan} index scans, {rows} rows"
+                )
+
+            self.stdout.write("\nUnused indexes:")
+            cursor.execute(UNUSED_INDEXES, [tables, options["max_scans"]])
+            for table, index, idx_scan, size in cursor.fetchall():
+                self.stdout.write(
+                    f"  {table}: {index} ({idx_scan} scans, {size // 1024} KiB)"
+                )
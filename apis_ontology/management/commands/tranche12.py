@@ -6,12 +6,19 @@ Therefore we use a separate script
 """
 
 import datetime
+import os
 import pathlib
+import time
 import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
 
 from django.core.management.base import BaseCommand
+from django.db import connections, transaction
 
-from apis_core.apis_metainfo.models import Uri
+from apis_core.uris.models import Uri
 from apis_ontology.models import Person, Profession, ProfessionCategory, Source
 
 
@@ -69,6 +76,10 @@ def gender(value):
 
 
 def parse(filepath):
+    """
+    Parse an XML file into a dict of plain data. This does not touch
+    the database, so it can be run in a worker process.
+    """
     root = ET.parse(filepath).getroot()
 
     person = {}
@@ -97,17 +108,19 @@ def parse(filepath):
     else:
         source["orig_id"] = None
 
+    date = None
     if pubinfo := source.get("pubinfo", False):
         date = get_date_from_pubinfo_string(pubinfo)
 
+    professions = []
+    berufsgruppe = None
     beruf = root.find("./{*}Lexikonartikel/{*}Vita/{*}Beruf")
     if beruf is not None:
         professions = beruf.text or ""
         professions = professions.replace("und", ",")
-        professions = professions.split(",")
+        professions = [profession.strip() for profession in professions.split(",")]
 
         berufsgruppe = beruf.get("Berufsgruppe")
-        person["professioncategory"] = ProfessionCategory.objects.get(name=berufsgruppe)
 
     gebdat = root.find("./{*}Lexikonartikel/{*}Vita/{*}Geburt")
     if gebdat is not None:
@@ -138,35 +151,160 @@ def parse(filepath):
     person["external_resources"] = [el.get("href") for el in externe_verweise]
     person["alternative_names"] = []
 
-    dbperson = Person(**person)
-    dbperson.skip_history_when_saving = True
-    dbperson.save()
-    dbperson.skip_history_when_saving = True
-    for profession in professions:
-        profession = profession.strip()
-        dbprofession = Profession.objects.filter(name=profession).first()
-        if dbprofession is None:
-            dbprofession = Profession.objects.create(name=profession)
-        dbperson.profession.add(dbprofession)
-
-    del dbperson.skip_history_when_saving
-    dbperson._history_date = date
-    dbperson.save()
-
-    dbperson.history.first().delete()
-
-    print(f"Created {dbperson!r}")
-
-    s, _ = Source.objects.get_or_create(**source)
-    s.content_object = dbperson
-    s.save()
-    for uri in uris:
-        u, created = Uri.objects.get_or_create(uri=uri)
-        if not created:
-            print(f"Merge {dbperson!r} with {u.content_object!r}")
-        else:
-            u.content_object = dbperson
-            u.save()
+    return {
+        "person": person,
+        "professions": professions,
+        "professioncategory": berufsgruppe,
+        "source": source,
+        "uris": uris,
+        "date": date,
+    }
+
+
+def parse_files(files, workers, batch_size, timings):
+    """
+    Parse `files` using a pool of `workers` processes and yield the
+    results in batches of `batch_size`. The time spent waiting for the
+    parsers is added to `timings["parse"]`.
+    """
+    # the worker processes are forked and must not share
+    # the database connections of this process
+    connections.close_all()
+    files = iter(files)
+    with ProcessPoolExecutor(workers, mp_context=get_context("fork")) as pool:
+        # at most two batches of files are parsed ahead of the batch
+        # that is written, so the results do not pile up in memory
+        pending = deque(pool.submit(parse, f) for f in islice(files, batch_size * 2))
+        batch = []
+        while pending:
+            start = time.perf_counter()
+            batch.append(pending.popleft().result())
+            timings["parse"] += time.perf_counter() - start
+            if (filepath := next(files, None)) is not None:
+                pending.append(pool.submit(parse, filepath))
+            if len(batch) == batch_size or not pending:
+                yield batch
+                batch = []
+
+
+def resolve_professions(batch, create=True):
+    """
+    Look up the professions and profession categories of a batch of
+    parsed files. If `create` is set, the professions that do not
+    exist yet are created.
+    """
+    names = {name for data in batch for name in data["professions"]}
+    if create:
+        existing = Profession.objects.filter(name__in=names).values_list(
+            "name", flat=True
+        )
+        Profession.objects.bulk_create(
+            [Profession(name=name) for name in names - set(existing)]
+        )
+    professions = {}
+    for profession in Profession.objects.filter(name__in=names).order_by("-pk"):
+        professions[profession.name] = profession
+
+    categories = {
+        category.name: category
+        for category in ProfessionCategory.objects.filter(
+            name__in={data["professioncategory"] for data in batch}
+        )
+    }
+    for data in batch:
+        if name := data["professioncategory"]:
+            if name not in categories:
+                raise ProfessionCategory.DoesNotExist(
+                    f"Profession category {name} does not exist"
+                )
+            data["person"]["professioncategory"] = categories[name]
+    return professions
+
+
+def resolve_sources(batch):
+    """
+    Look up the existing sources of a batch of parsed files
+    """
+    sources = defaultdict(list)
+    for source in Source.objects.filter(
+        orig_filename__in={data["source"]["orig_filename"] for data in batch}
+    ).order_by("pk"):
+        sources[source.orig_filename].append(source)
+    return [
+        next(
+            (
+                source
+                for source in sources[data["source"]["orig_filename"]]
+                if all(
+                    getattr(source, key) == value
+                    for key, value in data["source"].items()
+                )
+            ),
+            None,
+        )
+        for data in batch
+    ]
+
+
+def write(batch, timings):
+    """
+    Create the persons of a batch of parsed files, together with their
+    professions, their sources and their uris.
+    """
+    with transaction.atomic():
+        start = time.perf_counter()
+        professions = resolve_professions(batch)
+        sources = resolve_sources(batch)
+        uris = Uri.objects.in_bulk(
+            [uri for data in batch for uri in data["uris"]], field_name="uri"
+        )
+        timings["resolve"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+
+        # like the original import, this does not write the history of
+        # the persons, which is added afterwards by `tranche12_2`
+        persons = []
+        for data in batch:
+            dbperson = Person(**data["person"])
+            dbperson.skip_history_when_saving = True
+            dbperson.save()
+            del dbperson.skip_history_when_saving
+            persons.append(dbperson)
+            print(f"Created {dbperson!r}")
+
+        Person.profession.through.objects.bulk_create(
+            [
+                Person.profession.through(
+                    person_id=dbperson.pk, profession_id=professions[name].pk
+                )
+                for dbperson, data in zip(persons, batch)
+                for name in data["professions"]
+            ],
+            ignore_conflicts=True,
+        )
+
+        for dbperson, s in zip(persons, sources):
+            if s is not None:
+                s.content_object = dbperson
+        Source.objects.bulk_update(
+            [s for s in sources if s is not None], ["content_type", "object_id"]
+        )
+        Source.objects.bulk_create(
+            [
+                Source(**data["source"], content_object=dbperson)
+                for dbperson, s, data in zip(persons, sources, batch)
+                if s is None
+            ]
+        )
+
+        for dbperson, data in zip(persons, batch):
+            for uri in data["uris"]:
+                if u := uris.get(uri):
+                    print(f"Merge {dbperson!r} with {u.content_object!r}")
+                else:
+                    uris[uri] = Uri.objects.create(uri=uri, content_object=dbperson)
+    timings["write"] += time.perf_counter() - start
 
 
 class Command(BaseCommand):
@@ -174,9 +312,16 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--path", type=pathlib.Path)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--batch-size", type=int, default=100)
 
     def handle(self, *args, **options):
         if path := options.get("path"):
-            files = path.glob("*.xml")
-            for file in files:
-                parse(file)
+            timings = defaultdict(float)
+            files = sorted(path.glob("*.xml"))
+            for batch in parse_files(
+                files, options["workers"], options["batch_size"], timings
+            ):
+                write(batch, timings)
+            for stage, duration in timings.items():
+                self.stdout.write(f"{stage}: {duration:.1f}s")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apis_ontology.models import RelationEdge
+from apis_ontology.network import person_relation_models, update_relation_edges
+
+
+class Command(BaseCommand):
+    help = "Rebuild the adjacency list of the relations between persons"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RelationEdge.objects.all().delete()
+            for model in person_relation_models():
+                update_relation_edges(model.objects.all())
+                self.stdout.write(f"Updated the edges of {model.__name__}")
+        self.stdout.write(f"{RelationEdge.objects.count()} edges")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apis_ontology.models import Person
+from apis_ontology.search import update_person_search_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full text search documents of persons"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids", nargs="*", type=int, help="Only rebuild persons with these ids"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        persons = Person.objects.all()
+        if options["ids"]:
+            persons = persons.filter(pk__in=options["ids"])
+        pks = list(persons.order_by("pk").values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start : start + batch_size]
+            update_person_search_documents(Person.objects.filter(pk__in=batch))
+            self.stdout.write(f"Updated {start + len(batch)}/{len(pks)} persons")
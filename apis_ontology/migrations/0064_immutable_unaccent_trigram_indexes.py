@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# `unaccent` is only `STABLE`, because it depends on the dictionary
+# configured via the search path. We wrap it in a function with an
+# explicit dictionary, so we can use it in expression indexes.
+IMMUTABLE_UNACCENT = """
+CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+"""
+
+TRIGRAM_INDEXES = [
+    ("apis_ontology_person", "surname"),
+    ("apis_ontology_person", "forename"),
+    ("apis_ontology_institution", "label"),
+    ("apis_ontology_place", "label"),
+]
+
+
+# Like the `unaccent` and `pg_trgm` extensions, the function and the
+# indexes only exist on PostgreSQL; other databases are left alone
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(IMMUTABLE_UNACCENT)
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} "
+            f"USING gin (immutable_unaccent({column}) gin_trgm_ops);"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_{column}_trgm;")
+    schema_editor.execute("DROP FUNCTION IF EXISTS immutable_unaccent(text);")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0063_alter_place_feature_code_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
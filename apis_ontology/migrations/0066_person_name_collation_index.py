@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# The person list is ordered by the ICU collated surname and forename
+# (see `PersonListViewQueryset`). A plain index on those columns uses
+# the default collation and can not be used for that ordering, so we
+# create an index on the collated expressions.
+PERSON_NAME_COLLATION_INDEX = """
+CREATE INDEX IF NOT EXISTS apis_ontology_person_name_icu ON apis_ontology_person (
+    (surname COLLATE "en-x-icu"),
+    (forename COLLATE "en-x-icu"),
+    rootobject_ptr_id
+);
+"""
+
+
+# The ICU collation only exists on PostgreSQL, other databases order
+# by the binary collation (see `querysets.DB_COLLATION`)
+def create_collation_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(PERSON_NAME_COLLATION_INDEX)
+
+
+def drop_collation_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS apis_ontology_person_name_icu;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0065_personsearchdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_collation_index, drop_collation_index),
+    ]
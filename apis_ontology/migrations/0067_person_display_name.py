@@ -0,0 +1,62 @@
+# Generated by Django 6.1.2 on 2026-10-17 17:50
+
+from django.db import migrations
+
+import apis_ontology.models
+
+
+def person_display_name(forename, surname, alternative_names):
+    """
+    A copy of `apis_ontology.models.person_display_name`, so that this
+    migration keeps computing the same names if the function changes
+    """
+    if forename and surname:
+        return f"{forename} {surname}"
+    if isinstance(alternative_names, list):
+        for alt_name in alternative_names:
+            if isinstance(alt_name, dict) and alt_name.get("name"):
+                return alt_name["name"]
+    if forename or surname:
+        return forename or surname
+    return "unbekannt"
+
+
+def set_display_names(apps, schema_editor):
+    """Compute the display name of all existing persons"""
+    Person = apps.get_model("apis_ontology", "Person")
+
+    persons = Person.objects.only("forename", "surname", "alternative_names")
+    batch = []
+    for person in persons.iterator(chunk_size=2000):
+        person.display_name = person_display_name(
+            person.forename, person.surname, person.alternative_names
+        )
+        batch.append(person)
+        if len(batch) == 2000:
+            Person.objects.bulk_update(batch, ["display_name"])
+            batch = []
+    Person.objects.bulk_update(batch, ["display_name"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0066_person_name_collation_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="person",
+            name="display_name",
+            field=apis_ontology.models.PersonDisplayNameField(
+                blank=True, db_index=True, default="", editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="versionperson",
+            name="display_name",
+            field=apis_ontology.models.PersonDisplayNameField(
+                blank=True, db_index=True, default="", editable=False
+            ),
+        ),
+        migrations.RunPython(set_display_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0067_person_display_name"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="source",
+            index=models.Index(
+                fields=["content_type", "object_id"],
+                name="apis_ontolo_content_5725b1_idx",
+            ),
+        ),
+    ]
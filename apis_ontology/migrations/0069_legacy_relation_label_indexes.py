@@ -0,0 +1,90 @@
+# Generated by Django 6.1.2 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0068_source_content_type_object_id_index"),
+        ("relations", "0003_relation_relations_r_subj_content_type_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="institutioninstitutionlegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__10eea1_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personeventlegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__cca11d_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personinstitutionlegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__4b0ee8_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personpersonlegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__9942b4_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personplacelegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__ac2d05_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="personworklegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__fdc1d6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="placeplacelegacyrelation",
+            index=models.Index(
+                fields=[
+                    "legacy_relation_vocab_label",
+                    "legacy_relation_vocab_label_reverse",
+                    "relation_ptr",
+                ],
+                name="apis_ontolo_legacy__f0cdcc_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 6.1.2 on 2026-10-17 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_relation_edges(apps, schema_editor):
+    """Create the edges of the existing relations between persons"""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    RelationEdge = apps.get_model("apis_ontology", "RelationEdge")
+
+    person = ContentType.objects.filter(
+        app_label="apis_ontology", model="person"
+    ).first()
+    if person is None:
+        # the content types are created after the first migration,
+        # so there are no relations yet
+        return
+    for model in apps.get_app_config("apis_ontology").get_models():
+        # the historical models of the relations have their own primary key
+        if model._meta.pk.name != "relation_ptr":
+            continue
+        relations = model.objects.filter(
+            subj_content_type=person,
+            obj_content_type=person,
+            subj_object_id__isnull=False,
+            obj_object_id__isnull=False,
+        )
+        if not relations.exists():
+            continue
+        relation_type, _ = ContentType.objects.get_or_create(
+            app_label="apis_ontology", model=model._meta.model_name
+        )
+        batch = []
+        for relation in relations.iterator(chunk_size=2000):
+            batch.append(
+                RelationEdge(
+                    relation_id=relation.pk,
+                    relation_type=relation_type,
+                    subj_object_id=relation.subj_object_id,
+                    obj_object_id=relation.obj_object_id,
+                    start_date_sort=getattr(relation, "start_date_sort", None),
+                    end_date_sort=getattr(relation, "end_date_sort", None),
+                )
+            )
+            if len(batch) == 2000:
+                RelationEdge.objects.bulk_create(batch)
+                batch = []
+        RelationEdge.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("apis_ontology", "0069_legacy_relation_label_indexes"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("relations", "0003_relation_relations_r_subj_content_type_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelationEdge",
+            fields=[
+                (
+                    "relation",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="relations.relation",
+                    ),
+                ),
+                ("subj_object_id", models.PositiveIntegerField()),
+                ("obj_object_id", models.PositiveIntegerField()),
+                ("start_date_sort", models.DateField(null=True)),
+                ("end_date_sort", models.DateField(null=True)),
+                (
+                    "relation_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["subj_object_id", "obj_object_id"],
+                        name="apis_ontolo_subj_ob_9b3112_idx",
+                    ),
+                    models.Index(
+                        fields=["obj_object_id", "subj_object_id"],
+                        name="apis_ontolo_obj_obj_52a11d_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_relation_edges, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,14 @@
+from functools import cache, partial
 from pathlib import Path
 from typing import Self
 
 from auditlog.registry import auditlog
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.urls import reverse
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.urls import get_script_prefix, reverse
 from django.utils.translation import gettext_lazy as _
 from django_interval.fields import FuzzyDateParserField
 from django_json_editor_field.fields import JSONEditorField
@@ -26,6 +29,79 @@ from apis_ontology.rdfconfigs import event, institution, person, prize, professi
 
 RDFIMPORT = Path(__file__).parent / "rdfimport"
 
+# The primary key used to split the detail urls of entities (the
+# pk converter only accepts digits, so it can not be a string)
+URI_PLACEHOLDER = 987654321987654321
+
+
+def person_display_name(forename, surname, alternative_names):
+    # Check if both proper names exist
+    if forename and surname:
+        return f"{forename} {surname}"
+
+    if alternative_names:
+        try:
+            alt_names = alternative_names
+            if alt_names and isinstance(alt_names, list) and len(alt_names) > 0:
+                # Take first alternative name that has a name property
+                for alt_name in alt_names:
+                    if isinstance(alt_name, dict) and alt_name.get("name"):
+                        return alt_name["name"]
+        except AttributeError:
+            pass
+
+    # If no alternative name found, use whatever proper name exists
+    if forename or surname:
+        return forename or surname
+
+    # If no names found at all
+    return "unbekannt"
+
+
+# The fields the display name of a person is computed from
+DISPLAY_NAME_FIELDS = {"forename", "surname", "alternative_names"}
+
+
+class PersonDisplayNameField(models.CharField):
+    """
+    Stores the display name of a person, so it can be used to sort and
+    search persons in the database. Like the date fields of the
+    `FuzzyDateParserField`, the value is computed in `pre_save`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        kwargs.setdefault("default", "")
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        value = person_display_name(
+            model_instance.forename,
+            model_instance.surname,
+            model_instance.alternative_names,
+        )
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def update_person_display_names(queryset):
+    """
+    Recompute the `display_name` of the persons in `queryset`. Neither
+    `QuerySet.update` nor `bulk_update` call `pre_save`, so this has
+    to be called after changing the names of persons that way.
+    """
+    fields = ["display_name", *DISPLAY_NAME_FIELDS]
+    changed = []
+    for instance in queryset.only(*fields).iterator(chunk_size=2000):
+        display_name = person_display_name(
+            instance.forename, instance.surname, instance.alternative_names
+        )
+        if instance.display_name != display_name:
+            instance.display_name = display_name
+            changed.append(instance)
+    queryset.model.objects.bulk_update(changed, ["display_name"], batch_size=2000)
+
 
 class LegacyDateMixin(models.Model):
     start = FuzzyDateParserField(
@@ -70,11 +146,25 @@ class LegacyStuffMixin(models.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    @cache
+    def uri_parts(cls, script_prefix):
+        """
+        The parts of the detail url of this model before and after the
+        primary key. The url is the same for all instances except for the
+        primary key, so we only resolve the content type and reverse the
+        url once per model and `script_prefix`, which has to be the one
+        `reverse` currently uses (see `get_script_prefix`).
+        """
+        contenttype = ContentType.objects.get_for_model(cls)
+        uri = reverse("apis_core:generic:detail", args=[contenttype, URI_PLACEHOLDER])
+        prefix, _, suffix = uri.rpartition(str(URI_PLACEHOLDER))
+        return prefix, suffix
+
     @property
     def uri(self):
-        contenttype = ContentType.objects.get_for_model(self)
-        uri = reverse("apis_core:generic:detail", args=[contenttype, self.pk])
-        return uri
+        prefix, suffix = self.uri_parts(get_script_prefix())
+        return f"{prefix}{self.pk}{suffix}"
 
 
 class Source(GenericModel, models.Model):
@@ -91,6 +181,9 @@ class Source(GenericModel, models.Model):
     object_id = models.PositiveIntegerField(blank=True, null=True)
     content_object = GenericForeignKey("content_type", "object_id")
 
+    class Meta:
+        indexes = [models.Index(fields=["content_type", "object_id"])]
+
     def __str__(self):
         if retstr := self.orig_filename:
             if self.author:
@@ -329,6 +422,7 @@ class Person(
     }
 
     alternative_names = JSONEditorField(schema=schema, options=options, null=True)
+    display_name = PersonDisplayNameField(db_index=True)
 
     # texts
     # "ÖBL Haupttext"
@@ -403,27 +497,20 @@ class Person(
     }
 
     def __str__(self):
-        # Check if both proper names exist
-        if self.forename and self.surname:
-            return f"{self.forename} {self.surname}"
-
-        if self.alternative_names:
-            try:
-                alt_names = self.alternative_names
-                if alt_names and isinstance(alt_names, list) and len(alt_names) > 0:
-                    # Take first alternative name that has a name property
-                    for alt_name in alt_names:
-                        if isinstance(alt_name, dict) and alt_name.get("name"):
-                            return alt_name["name"]
-            except AttributeError:
-                pass
-
-        # If no alternative name found, use whatever proper name exists
-        if self.forename or self.surname:
-            return self.forename or self.surname
-
-        # If no names found at all
-        return "unbekannt"
+        # querysets that only need the name of a person can load just
+        # the `display_name` instead of the fields it is computed from
+        deferred = self.get_deferred_fields()
+        if "display_name" not in deferred and deferred & DISPLAY_NAME_FIELDS:
+            return self.display_name
+        return person_display_name(self.forename, self.surname, self.alternative_names)
+
+    def save(self, *args, **kwargs):
+        # the `display_name` is computed from other fields, so it has to
+        # be saved whenever one of them is
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and DISPLAY_NAME_FIELDS & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "display_name"}
+        super().save(*args, **kwargs)
 
     @property
     def biographien_urls(self):
@@ -539,6 +626,93 @@ class Prize(AbstractEntity, VersionMixin, LegacyDateMixin, OEBLBaseEntity, Entit
         verbose_name_plural = _("prizes")
 
 
+class PersonSearchDocument(models.Model):
+    """
+    Denormalized, weighted full text search document for a person.
+    The `document` is built from the name and biography text fields
+    of the person and is kept up to date by a `post_save` signal; it
+    can be rebuilt with the `update_search_documents` command.
+    """
+
+    person = models.OneToOneField(
+        Person,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    document = SearchVectorField(null=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=["document"], name="person_search_document_gin")]
+
+
+class RelationEdge(models.Model):
+    """
+    Denormalized adjacency list of the relations between persons. Every
+    relation class lives in its own table, the edges of all of them are
+    collected in this one, so walking the network of a person needs one
+    query per hop. The edges are kept up to date by a `post_save` signal
+    and are deleted together with their relation; they can be rebuilt
+    with the `update_relation_edges` command.
+    """
+
+    relation = models.OneToOneField(
+        Relation, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    relation_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name="+"
+    )
+    subj_object_id = models.PositiveIntegerField()
+    obj_object_id = models.PositiveIntegerField()
+    start_date_sort = models.DateField(null=True)
+    end_date_sort = models.DateField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["subj_object_id", "obj_object_id"]),
+            models.Index(fields=["obj_object_id", "subj_object_id"]),
+        ]
+
+
+class CacheVersion(models.Model):
+    """
+    Version counters of cached data. The cache is local to every process,
+    so instead of deleting a cache entry when the data changes, the
+    version of the data is increased in the database and becomes part
+    of the cache key, which makes all the processes miss the old entry.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def get(cls, key) -> int:
+        return (
+            cls.objects.filter(key=key).values_list("version", flat=True).first() or 0
+        )
+
+    @classmethod
+    def increment(cls, key):
+        if not cls.objects.filter(key=key).update(version=models.F("version") + 1):
+            cls.objects.bulk_create([cls(key=key, version=1)], ignore_conflicts=True)
+
+    @classmethod
+    def increment_on_commit(cls, key):
+        """
+        Increase the version once the current transaction is committed,
+        and only once per transaction, so writers do not hold the lock
+        on the row of the counter until the end of their transactions.
+        """
+        increment = partial(cls.increment, key)
+        connection = transaction.get_connection()
+        for savepoints, callback, robust in connection.run_on_commit:
+            if isinstance(callback, partial) and (
+                (callback.func, callback.args) == (increment.func, increment.args)
+            ):
+                return
+        transaction.on_commit(increment)
+
+
 auditlog.register(Source, serialize_data=True)
 auditlog.register(Title, serialize_data=True)
 auditlog.register(ProfessionCategory, serialize_data=True)
@@ -591,6 +765,28 @@ class TempTripleLegacyAttributes(models.Model):
         max_length=255, blank=True, null=True
     )
 
+    LEGACY_LABEL_FIELDS = (
+        "legacy_relation_vocab_label",
+        "legacy_relation_vocab_label_reverse",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_legacy_labels = instance.legacy_labels()
+        return instance
+
+    def legacy_labels(self):
+        # deferred fields are not loaded, they can not have changed
+        return tuple(self.__dict__.get(field) for field in self.LEGACY_LABEL_FIELDS)
+
+    def legacy_labels_changed(self) -> bool:
+        """
+        Whether the labels differ from the ones loaded from the database
+        """
+        loaded = getattr(self, "_loaded_legacy_labels", None)
+        return loaded is None or loaded != self.legacy_labels()
+
     def name(self) -> str:
         return self.legacy_relation_vocab_label
 
@@ -604,6 +800,27 @@ class OeblRelation(Relation):
         ordering = ["pk"]
 
 
+class LegacyRelationMeta(OeblRelation.Meta):
+    """
+    Meta class of the legacy relation classes. The subject and object ids
+    of relations are stored (and indexed) in the table of `Relation`, the
+    labels of the legacy vocabulary in the tables of the legacy relation
+    classes. The index covers both the lookups by label and the listing
+    of the distinct labels, and contains the pointer to the relation,
+    so looking up the relations with a label does not need the table.
+    """
+
+    indexes = [
+        models.Index(
+            fields=[
+                "legacy_relation_vocab_label",
+                "legacy_relation_vocab_label_reverse",
+                "relation_ptr",
+            ]
+        )
+    ]
+
+
 ################################################
 # auto generated relation classes from properties
 ################################################
@@ -637,6 +854,9 @@ class PersonEventLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Person
     obj_model = Event
 
@@ -659,6 +879,9 @@ class PersonInstitutionLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Person
     obj_model = Institution
 
@@ -680,6 +903,9 @@ class PersonPersonLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Person
     obj_model = Person
 
@@ -701,6 +927,9 @@ class InstitutionInstitutionLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Institution
     obj_model = Institution
 
@@ -722,6 +951,9 @@ class PersonPlaceLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Person
     obj_model = Place
 
@@ -743,6 +975,9 @@ class PersonWorkLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Person
     obj_model = Work
 
@@ -764,6 +999,9 @@ class PlacePlaceLegacyRelation(
 ):
     """automatically generated class"""
 
+    class Meta(LegacyRelationMeta):
+        pass
+
     subj_model = Place
     obj_model = Place
 
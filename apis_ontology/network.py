@@ -0,0 +1,134 @@
+from functools import cache
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.db.models import DateField, F, IntegerField, Q, Value
+
+from apis_core.relations.models import Relation
+from apis_ontology.models import Person, RelationEdge
+
+
+@cache
+def person_relation_models():
+    """
+    The relation classes that have persons as subject and object.
+    """
+    return tuple(
+        model
+        for model in apps.get_models()
+        if issubclass(model, Relation)
+        and getattr(model, "subj_model", None) is Person
+        and getattr(model, "obj_model", None) is Person
+    )
+
+
+def date_sort(model, name):
+    try:
+        model._meta.get_field(f"{name}_date_sort")
+    except FieldDoesNotExist:
+        return Value(None, output_field=DateField())
+    return F(f"{name}_date_sort")
+
+
+def update_relation_edges(queryset):
+    """
+    (Re)build the edges of all the relations in `queryset`, which has
+    to be a queryset of one of the `person_relation_models`. Like the
+    search documents, the edges are computed in the database using a
+    single `INSERT ... SELECT` statement.
+    """
+    model = queryset.model
+    content_type = ContentType.objects.get_for_model(model)
+    # relations without a subject or an object do not have an edge,
+    # so the existing edges are deleted instead of being updated
+    existing = RelationEdge.objects.filter(relation__in=queryset.values("pk"))
+    queryset = (
+        queryset.order_by()
+        .filter(subj_object_id__isnull=False, obj_object_id__isnull=False)
+        .annotate(
+            edge_type=Value(content_type.pk, output_field=IntegerField()),
+            edge_start=date_sort(model, "start"),
+            edge_end=date_sort(model, "end"),
+        )
+        .values(
+            "pk",
+            "subj_object_id",
+            "obj_object_id",
+            "edge_type",
+            "edge_start",
+            "edge_end",
+        )
+    )
+    sql, params = queryset.query.sql_with_params()
+    table = RelationEdge._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing.delete()
+        cursor.execute(
+            f"INSERT INTO {table} (relation_id, subj_object_id, obj_object_id, "
+            f"relation_type_id, start_date_sort, end_date_sort) {sql} "
+            "ON CONFLICT (relation_id) DO UPDATE SET "
+            "subj_object_id = EXCLUDED.subj_object_id, "
+            "obj_object_id = EXCLUDED.obj_object_id, "
+            "relation_type_id = EXCLUDED.relation_type_id, "
+            "start_date_sort = EXCLUDED.start_date_sort, "
+            "end_date_sort = EXCLUDED.end_date_sort",
+            params,
+        )
+
+
+def person_network(person_id, depth, max_nodes, max_edges):
+    """
+    Collect the persons that are at most `depth` relations away from
+    the person with the id `person_id`, using a breadth first search
+    that needs one query per hop. The search stops adding persons once
+    there are `max_nodes` of them, and every hop reads at most
+    `max_edges` edges, so persons with many relations do not make
+    a hop read all of their edges.
+
+    Returns:
+        A dict mapping the ids of the persons to their distance, a dict
+        mapping the ids of the traversed relations to their edges and
+        whether persons or relations were left out because of the limits
+    """
+    distances = {person_id: 0}
+    edges = {}
+    truncated = False
+    frontier = {person_id}
+    for distance in range(1, depth + 1):
+        if not frontier:
+            break
+        found = list(
+            RelationEdge.objects.filter(
+                Q(subj_object_id__in=frontier) | Q(obj_object_id__in=frontier)
+            )
+            .order_by("relation_id")
+            .values(
+                "relation_id",
+                "relation_type_id",
+                "subj_object_id",
+                "obj_object_id",
+                "start_date_sort",
+                "end_date_sort",
+            )[: max_edges + 1]
+        )
+        if len(found) > max_edges:
+            truncated = True
+            found = found[:max_edges]
+        frontier = set()
+        for edge in found:
+            for node in (edge["subj_object_id"], edge["obj_object_id"]):
+                if node not in distances:
+                    if len(distances) >= max_nodes:
+                        truncated = True
+                        continue
+                    distances[node] = distance
+                    frontier.add(node)
+            # only keep the edges between the persons of the network
+            if (
+                edge["subj_object_id"] in distances
+                and edge["obj_object_id"] in distances
+            ):
+                edges[edge["relation_id"]] = edge
+    return distances, edges, truncated
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import functools
+import json
+import operator
+
+from django.db.models import CharField, F, Q, TextField
+from django.db.models.functions import Collate
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from apis_ontology.models import Person
+from apis_ontology.querysets import DB_COLLATION, PERSON_KEYSET
+
+KEYSETS = {Person: PERSON_KEYSET}
+
+
+def keyset_expressions(model):
+    """
+    Return a list of `(expression, nullable)` tuples for the keyset
+    fields of the model. Text fields are compared using the same
+    collation that is used for ordering the lists.
+    """
+    expressions = []
+    for name in KEYSETS.get(model, ("pk",)):
+        field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        expression = F(name)
+        if isinstance(field, (CharField, TextField)):
+            expression = Collate(name, DB_COLLATION)
+        expressions.append((expression, field.null))
+    return expressions
+
+
+def seek(keys, position):
+    """
+    Build a filter for the rows that come after `position` when ordering
+    ascending by the `keys`, with NULL values last. The NULL values have
+    to be sorted last explicitly, not all databases do that by default.
+    """
+    clauses = []
+    equal = Q()
+    for (key, nullable), value in zip(keys, position):
+        if value is None:
+            equal &= Q(**{f"{key}__isnull": True})
+            continue
+        after = Q(**{f"{key}__gt": value})
+        if nullable:
+            after |= Q(**{f"{key}__isnull": True})
+        clauses.append(equal & after)
+        equal &= Q(**{key: value})
+    return functools.reduce(operator.or_, clauses)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate by seeking to the position after the last row of the
+    previous page instead of skipping `offset` rows, so walking through
+    all the pages takes linear time. The position is passed around in
+    the opaque `cursor` parameter. Persons are ordered by surname,
+    forename and id, all other models by id.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = 50
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request, length):
+        """
+        Decode the position from the cursor, which has to be a list
+        of `length` values that can be compared with the keys.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound("Invalid cursor")
+        for value in position:
+            if isinstance(value, bool) or not isinstance(
+                value, (str, int, float, type(None))
+            ):
+                raise NotFound("Invalid cursor")
+        return position
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        expressions = keyset_expressions(queryset.model)
+        keys = [
+            (f"_keyset_{i}", nullable) for i, (_, nullable) in enumerate(expressions)
+        ]
+        queryset = queryset.annotate(
+            **{key: expression for (key, _), (expression, _) in zip(keys, expressions)}
+        ).order_by(*[F(key).asc(nulls_last=True) for key, _ in keys])
+
+        if (position := self.decode_cursor(request, len(keys))) is not None:
+            queryset = queryset.filter(seek(keys, position))
+
+        results = list(queryset[: page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            self.next_position = [getattr(last, key) for key, _ in keys]
+        return results
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -3,16 +3,17 @@ import os
 
 from django.conf import settings
 from django.contrib.postgres.search import TrigramSimilarity
-from django.db.models import Case, FloatField, Value, When
+from django.db.models import Case, FloatField, Prefetch, Value, When
 from django.db.models.functions import Collate, Greatest, Length
 
+from apis_core.generic.helpers import generate_search_filter
 from apis_core.utils.autocomplete import (
     ExternalAutocomplete,
     LobidAutocompleteAdapter,
     TypeSenseAutocompleteAdapter,
 )
 
-from .models import Institution, Person, Place
+from .models import Institution, Person, Place, Source
 
 logger = logging.getLogger(__name__)
 
@@ -20,23 +21,104 @@ DB_COLLATION = (
     "binary" if "sqlite" in settings.DATABASES["default"]["ENGINE"] else "en-x-icu"
 )
 
+# The large biography text fields of a person. Those are not needed
+# to render lists, so we don't load them from the database there.
+PERSON_TEXT_FIELDS = (
+    "oebl_haupttext",
+    "oebl_kurzinfo",
+    "online_edition_haupttext",
+    "nachrecherche",
+    "soziale_herkunft",
+    "verwandtschaft",
+    "ausbildung_studium_studienreise",
+    "berufstaetigkeit_lebenstationen",
+    "mitgliedschaften_orden_auszeichnungen",
+    "literatur",
+    "berufe",
+    "sterbedatum",
+    "adelspraedikat",
+    "uebersiedlung_emigration",
+    "weitere_namensformen",
+    "geburtsdatum",
+    "sterbeort",
+    "geburtsort",
+    "religionen",
+    "name_text",
+    "pseudonyme",
+    "oebl_werkverzeichnis",
+    "references",
+    "notes",
+)
+
+# The `PersonTable` uses the `oebl_kurzinfo` as tooltip. It shows the
+# `surname` and `forename` columns, but not the `alternative_names`, so
+# with those deferred the persons use their `display_name` as string.
+PERSON_LIST_DEFERRED_FIELDS = (
+    *(field for field in PERSON_TEXT_FIELDS if field != "oebl_kurzinfo"),
+    "alternative_names",
+)
+
+# The fields needed to render `person_autocomplete_result.html`
+PERSON_AUTOCOMPLETE_FIELDS = (
+    "display_name",
+    "start_date_sort",
+    "end_date_sort",
+    "professioncategory",
+)
+
+
+# This ordering is backed by the `apis_ontology_person_name_icu` index,
+# the `pk` makes the ordering deterministic for pagination
+PERSON_LIST_ORDERING = (
+    Collate("surname", DB_COLLATION),
+    Collate("forename", DB_COLLATION),
+    "pk",
+)
+
+# The fields used for keyset pagination of persons, see `KeysetPagination`
+PERSON_KEYSET = ("surname", "forename", "pk")
+
 
 def PersonListViewQueryset(*args):
-    return Person.objects.all().order_by(
-        Collate("surname", DB_COLLATION), Collate("forename", DB_COLLATION)
+    # The `BiographienLinkColumn` of the `PersonTable` lists the sources
+    sources = Source.objects.only(
+        "orig_filename", "pubinfo", "content_type", "object_id"
     )
+    return (
+        Person.objects.all()
+        .defer(*PERSON_LIST_DEFERRED_FIELDS)
+        .prefetch_related(Prefetch("sources", queryset=sources))
+        .order_by(*PERSON_LIST_ORDERING)
+    )
+
+
+# The API querysets don't use `.distinct()` - none of the filters join
+# multi valued relations, the many to many filters use subqueries (see
+# `SubqueryModelMultipleChoiceFilter`)
 
 
 def InstitutionViewSetQueryset(*args):
-    return Institution.objects.all().distinct()
+    return Institution.objects.all()
 
 
 def PersonViewSetQueryset(*args):
-    return Person.objects.all().distinct()
+    # the text fields can be requested using the `fields`
+    # parameter, see `PersonApiFilterSet`
+    return Person.objects.all().defer(*PERSON_TEXT_FIELDS)
 
 
 def PlaceViewSetQueryset(*args):
-    return Place.objects.all().distinct()
+    return Place.objects.all()
+
+
+def PersonAutocompleteQueryset(model, query):
+    # the same search as the default autocomplete, but only loading
+    # what the result template shows
+    return (
+        model.objects.filter(generate_search_filter(model, query))
+        .select_related("professioncategory")
+        .only(*PERSON_AUTOCOMPLETE_FIELDS)
+    )
 
 
 def InstitutionAutocompleteQueryset(model, query):
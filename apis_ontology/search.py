@@ -0,0 +1,78 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+
+from apis_ontology.lookups import ImmutableUnaccent
+from apis_ontology.models import PersonSearchDocument
+
+SEARCH_CONFIG = "german"
+
+# The fields of a person that end up in its search document,
+# grouped by the weight they get in the `tsvector`
+PERSON_SEARCH_FIELDS = {
+    "A": [
+        "surname",
+        "forename",
+        "name_text",
+        "weitere_namensformen",
+        "pseudonyme",
+    ],
+    "B": [
+        "oebl_kurzinfo",
+        "berufe",
+        "adelspraedikat",
+    ],
+    "C": [
+        "oebl_haupttext",
+        "online_edition_haupttext",
+        "oebl_werkverzeichnis",
+    ],
+    "D": [
+        "nachrecherche",
+        "soziale_herkunft",
+        "verwandtschaft",
+        "ausbildung_studium_studienreise",
+        "berufstaetigkeit_lebenstationen",
+        "mitgliedschaften_orden_auszeichnungen",
+        "literatur",
+        "uebersiedlung_emigration",
+        "religionen",
+        "geburtsort",
+        "sterbeort",
+    ],
+}
+
+
+def person_search_vector():
+    vectors = [
+        SearchVector(ImmutableUnaccent(field), weight=weight, config=SEARCH_CONFIG)
+        for weight, fields in PERSON_SEARCH_FIELDS.items()
+        for field in fields
+    ]
+    return reduce(operator.add, vectors)
+
+
+def update_person_search_documents(queryset):
+    """
+    (Re)build the search documents of all the persons in `queryset`.
+    The documents are computed in the database using a single
+    `INSERT ... SELECT` statement, so the text fields never have to
+    be loaded into Python. The search documents only exist on PostgreSQL.
+    """
+    if connection.vendor != "postgresql":
+        return
+    queryset = (
+        queryset.order_by()
+        .annotate(document=person_search_vector())
+        .values("pk", "document")
+    )
+    sql, params = queryset.query.sql_with_params()
+    table = PersonSearchDocument._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (person_id, document) {sql} "
+            "ON CONFLICT (person_id) DO UPDATE SET document = EXCLUDED.document",
+            params,
+        )
@@ -1,25 +1,38 @@
+import itertools
+from collections import defaultdict
 from typing import Any
 
+from django.db import models
 from rdflib import Graph, Literal, Namespace, URIRef
 from rdflib.namespace import RDF, RDFS, XSD
+from rest_framework.serializers import ListSerializer
 
 from apis_core.entities.serializers import E21_PersonCidocSerializer
-from apis_core.generic.serializers import GenericModelCidocSerializer
+from apis_core.generic.helpers import split_and_strip_parameter
+from apis_core.generic.serializers import (
+    GenericHyperlinkedModelSerializer,
+    GenericModelCidocSerializer,
+)
 from apis_core.generic.utils.rdf_namespace import ATTRIBUTES, CRM
 from apis_core.relations.utils import relation_content_types
 from apis_ontology.models import (
     Institution,
     Person,
     PersonPlaceLegacyRelation,
+    Place,
     StarbIn,
     WurdeGeborenIn,
 )
+from apis_ontology.querysets import PERSON_TEXT_FIELDS
+
+LEGACY_LIFE_EVENT_LABELS = {"geboren in": "birth", "gestorben in": "death"}
 
 
 def normalize_empty_attributes(instance):
     """
     Normalize empty string attributes of a Django model instance to None.
     Only processes actual model fields, not methods or private attributes.
+    Deferred fields are skipped, so they are not loaded from the database.
 
     Args:
         instance: Django model instance
@@ -27,7 +40,10 @@ def normalize_empty_attributes(instance):
     Returns:
         The modified instance with empty strings converted to None
     """
+    deferred_fields = instance.get_deferred_fields()
     for field in instance._meta.fields:
+        if field.attname in deferred_fields:
+            continue
         value = getattr(instance, field.name, None)
         if isinstance(value, str) and not value:
             setattr(instance, field.name, None)
@@ -97,32 +113,135 @@ def add_time_spans(g: Graph, ts_node: URIRef, instance: Any, field: str) -> Grap
     return g
 
 
+class PersonSerializer(GenericHyperlinkedModelSerializer):
+    """
+    The biography text fields are deferred in the `PersonViewSetQueryset`,
+    so lists only serialize them if they are explicitly requested using
+    the `fields` parameter, i.e. `?fields=surname,forename,oebl_haupttext`.
+    If the `fields` parameter is set, only the requested fields are
+    serialized. The detail endpoint serializes all the fields.
+    """
+
+    class Meta:
+        fields = "__all__"
+
+    def get_fields(self):
+        fields = super().get_fields()
+        params = []
+        if request := self.context.get("request", None):
+            params = request.query_params.getlist("fields")
+        if requested := set(filter(bool, split_and_strip_parameter(params))):
+            return {name: field for name, field in fields.items() if name in requested}
+        if getattr(self.context.get("view", None), "action", None) != "list":
+            return fields
+        return {
+            name: field
+            for name, field in fields.items()
+            if name not in PERSON_TEXT_FIELDS
+        }
+
+    def to_representation(self, instance):
+        # load the deferred fields we serialize using one query,
+        # instead of one query per field
+        if deferred := instance.get_deferred_fields() & self.fields.keys():
+            instance.refresh_from_db(fields=deferred)
+        return super().to_representation(instance)
+
+
+def life_event_places(person_ids):
+    """
+    Look up the birth and death places of multiple persons at once.
+    Relations of the legacy `PersonPlaceLegacyRelation` take precedence
+    over `WurdeGeborenIn` and `StarbIn`; if there are multiple relations,
+    the one with the lowest id is used.
+
+    Returns:
+        A dict mapping person ids to dicts with the `birth` and `death` places
+    """
+    place_ids = defaultdict(dict)
+    # we iterate in descending order, so the relation with the lowest id wins
+    for model, event_type in [(WurdeGeborenIn, "birth"), (StarbIn, "death")]:
+        relations = (
+            model.objects.filter(subj_object_id__in=person_ids)
+            .order_by("-pk")
+            .values_list("subj_object_id", "obj_object_id")
+        )
+        for person_id, place_id in relations:
+            place_ids[person_id][event_type] = place_id
+    legacy_relations = (
+        PersonPlaceLegacyRelation.objects.filter(
+            subj_object_id__in=person_ids,
+            legacy_relation_vocab_label__in=LEGACY_LIFE_EVENT_LABELS,
+        )
+        .order_by("-pk")
+        .values_list("subj_object_id", "legacy_relation_vocab_label", "obj_object_id")
+    )
+    for person_id, label, place_id in legacy_relations:
+        place_ids[person_id][LEGACY_LIFE_EVENT_LABELS[label]] = place_id
+
+    places = Place.objects.in_bulk(
+        {place_id for ids in place_ids.values() for place_id in ids.values()}
+    )
+    return {
+        person_id: {
+            event_type: places[place_id]
+            for event_type, place_id in ids.items()
+            if place_id in places
+        }
+        for person_id, ids in place_ids.items()
+    }
+
+
+class PersonCidocListSerializer(ListSerializer):
+    """
+    Serialize persons in chunks and look up the birth and death places
+    of all the persons in a chunk at once, instead of querying them for
+    every single person.
+    """
+
+    chunk_size = 1000
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if isinstance(iterable, models.QuerySet):
+            iterable = iterable.iterator(chunk_size=self.chunk_size)
+        results = []
+        for chunk in itertools.batched(iterable, self.chunk_size):
+            self.child.life_event_places = life_event_places(
+                [instance.pk for instance in chunk]
+            )
+            results.extend(self.child.to_representation(instance) for instance in chunk)
+        self.child.life_event_places = None
+        return results
+
+
 class PersonCidocSerializer(E21_PersonCidocSerializer):
-    def add_life_event_place(self, g, instance, event_type, event_uri):
+    # birth and death places of the persons that are being serialized,
+    # set by the `PersonCidocListSerializer`
+    life_event_places = None
+
+    class Meta:
+        list_serializer_class = PersonCidocListSerializer
+
+    def get_life_event_places(self, instance):
+        if self.life_event_places is None:
+            return life_event_places([instance.pk]).get(instance.pk, {})
+        return self.life_event_places.get(instance.pk, {})
+
+    def add_life_event_place(self, g, instance, event_type, event_uri, place):
         if event_type not in ["birth", "death"]:
             raise ValueError("event_type must be one of birth or death")
 
-        rel = None
         if event_type == "birth":
             crm_type = "E67_Birth"
             label_template = "Geburt von {}"
             crm_relation = "P98_brought_into_life"
-            leg_rel = PersonPlaceLegacyRelation.objects.filter(
-                subj_object_id=instance.pk, legacy_relation_vocab_label="geboren in"
-            ).first()
-            new_rel = WurdeGeborenIn.objects.filter(subj_object_id=instance.pk).first()
-            rel = leg_rel or new_rel
         if event_type == "death":
             crm_type = "E69_Death"
             label_template = "Tod von {}"
             crm_relation = "P100_was_death_of"
-            leg_rel = PersonPlaceLegacyRelation.objects.filter(
-                subj_object_id=instance.pk, legacy_relation_vocab_label="gestorben in"
-            ).first()
-            new_rel = StarbIn.objects.filter(subj_object_id=instance.pk).first()
-            rel = leg_rel or new_rel
 
-        if not rel:
+        if not place:
             return g
 
         if event_uri is None:
@@ -137,9 +256,9 @@ class PersonCidocSerializer(E21_PersonCidocSerializer):
             )
             g.add((event_uri, CRM[crm_relation], self.instance_uri))
 
-        place_ns = Namespace(rel.obj.get_namespace_uri())
-        g.namespace_manager.bind(rel.obj.get_namespace_prefix(), place_ns)
-        place_uri = URIRef(place_ns[str(rel.obj.id)])
+        place_ns = Namespace(place.get_namespace_uri())
+        g.namespace_manager.bind(place.get_namespace_prefix(), place_ns)
+        place_uri = URIRef(place_ns[str(place.id)])
         g.add((event_uri, CRM.P7_took_place_at, place_uri))
 
         return g
@@ -147,6 +266,7 @@ class PersonCidocSerializer(E21_PersonCidocSerializer):
     def to_representation(self, instance):
         instance = normalize_empty_attributes(instance)
         g = super().to_representation(instance)
+        places = self.get_life_event_places(instance)
         birth_event = None
         if instance.start_date_sort or (
             instance.start_date_from and instance.start_date_to
@@ -159,7 +279,9 @@ class PersonCidocSerializer(E21_PersonCidocSerializer):
             g.add((birth_event, CRM["P4_has_time-span"], birth_time_span))
             birth_time_span = URIRef(ATTRIBUTES[f"birth_time-span_{instance.id}"])
             g = add_time_spans(g, birth_time_span, instance, "start")
-        g = self.add_life_event_place(g, instance, "birth", birth_event)
+        g = self.add_life_event_place(
+            g, instance, "birth", birth_event, places.get("birth")
+        )
 
         death_event = None
         if instance.end_date_sort or (instance.end_date_from and instance.end_date_to):
@@ -171,7 +293,9 @@ class PersonCidocSerializer(E21_PersonCidocSerializer):
             g.add((death_event, CRM["P4_has_time-span"], death_time_span))
             death_time_span = URIRef(ATTRIBUTES[f"death_time-span_{instance.id}"])
             g = add_time_spans(g, death_time_span, instance, "end")
-        g = self.add_life_event_place(g, instance, "death", death_event)
+        g = self.add_life_event_place(
+            g, instance, "death", death_event, places.get("death")
+        )
         return g
 
 
@@ -36,6 +36,24 @@ APIS_BIBSONOMY = [
 
 APIS_RDF_NAMESPACE_PREFIX = "oebl"
 
+# word similarity threshold used by the trigram search filters
+OEBL_TRIGRAM_WORD_SIMILARITY_THRESHOLD = float(
+    os.environ.get("OEBL_TRIGRAM_WORD_SIMILARITY_THRESHOLD", 0.5)
+)
+
+# the relation types endpoint is cached in the default cache, the cache
+# entries are versioned in the database so changes to legacy relations
+# invalidate them in all processes
+OEBL_RELATION_TYPES_CACHE_TIMEOUT = int(
+    os.environ.get("OEBL_RELATION_TYPES_CACHE_TIMEOUT", 3600)
+)
+
+# limits of the network endpoint, which can otherwise return most of
+# the persons in the database for persons with many relations
+OEBL_NETWORK_MAX_DEPTH = int(os.environ.get("OEBL_NETWORK_MAX_DEPTH", 3))
+OEBL_NETWORK_MAX_NODES = int(os.environ.get("OEBL_NETWORK_MAX_NODES", 1000))
+OEBL_NETWORK_MAX_EDGES = int(os.environ.get("OEBL_NETWORK_MAX_EDGES", 5000))
+
 if os.environ.get("DJANGO_EMAIL_HOST"):
     EMAIL_HOST = os.environ.get("DJANGO_EMAIL_HOST")
 
@@ -1,9 +1,18 @@
 import os
 
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth.models import Group
 from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from apis_ontology.api_views import RELATION_TYPES_CACHE_KEY
+from apis_ontology.models import CacheVersion, Person, TempTripleLegacyAttributes
+from apis_ontology.network import person_relation_models, update_relation_edges
+from apis_ontology.search import update_person_search_documents
+
 
 @receiver(user_logged_in)
 def add_to_group(sender, user, request, **kwargs):
@@ -11,3 +20,52 @@ def add_to_group(sender, user, request, **kwargs):
     g1, _ = Group.objects.get_or_create(name="redaktion")
     if user.username in user_list:
         g1.user_set.add(user)
+
+
+@receiver(connection_created)
+def set_trigram_word_similarity_threshold(sender, connection, **kwargs):
+    """
+    The `%>` operator used by the trigram search filters compares
+    against `pg_trgm.word_similarity_threshold`, which is a setting
+    of the database session, so we set it for every new connection.
+    """
+    if connection.vendor == "postgresql":
+        threshold = getattr(settings, "OEBL_TRIGRAM_WORD_SIMILARITY_THRESHOLD", 0.5)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+                [str(threshold)],
+            )
+
+
+@receiver(post_save, sender=Person)
+def update_person_search_document(sender, instance, raw, **kwargs):
+    if not raw:
+        update_person_search_documents(Person.objects.filter(pk=instance.pk))
+
+
+def update_relation_edge(sender, instance, raw, **kwargs):
+    if not raw:
+        update_relation_edges(sender.objects.filter(pk=instance.pk))
+
+
+def invalidate_relation_types(sender, **kwargs):
+    CacheVersion.increment_on_commit(RELATION_TYPES_CACHE_KEY)
+
+
+def legacy_relation_saved(sender, instance, **kwargs):
+    if instance.legacy_labels_changed():
+        invalidate_relation_types(sender)
+        instance._loaded_legacy_labels = instance.legacy_labels()
+
+
+# the `possible_types` of the relation types are
+# based on the labels of the legacy relations
+for model in apps.get_models():
+    if issubclass(model, TempTripleLegacyAttributes):
+        post_save.connect(legacy_relation_saved, sender=model)
+        post_delete.connect(invalidate_relation_types, sender=model)
+
+# the edges are deleted together with their relation
+for model in person_relation_models():
+    post_save.connect(update_relation_edge, sender=model)
@@ -1,9 +1,13 @@
 import django_tables2 as tables
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import prefetch_related_objects
+from django_tables2.data import TableQuerysetData
 
 from apis_core.generic.tables import CustomTemplateColumn, GenericTable
 from apis_core.relations.tables import RelationsListTable
 
 from .models import Person
+from .querysets import PERSON_LIST_DEFERRED_FIELDS
 
 
 class BiographienLinkColumn(tables.TemplateColumn):
@@ -43,6 +47,17 @@ class PersonTable(GenericTable):
     start = tables.Column(order_by="start_date_sort")
     end = tables.Column(order_by="end_date_sort")
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The `PersonListViewQueryset` defers the text fields. Those that
+        # were selected as columns, which are also the ones that end up in
+        # the exports, are loaded with the rest of the row again.
+        columns = {column.name for column in self.columns.iterall()}
+        selected = columns.intersection(PERSON_LIST_DEFERRED_FIELDS)
+        if selected and isinstance(self.data, TableQuerysetData):
+            deferred = set(PERSON_LIST_DEFERRED_FIELDS) - selected
+            self.data.data = self.data.data.defer(None).defer(*deferred)
+
     def render_surname(self, record):
         return record.surname or "No name"
 
@@ -68,3 +83,14 @@ class OEBLBaseEntityRelationsTable(RelationsListTable):
                 "style": "max-width:30vw; word-wrap:break-word; overflow-wrap:break-word; white-space:normal;"
             }
         }
+        # The relation column links the subjects or objects of the
+        # relations, which are loaded one by one otherwise. Persons only
+        # need their `display_name` for that.
+        prefetches = [
+            GenericPrefetch(field, [Person.objects.only("display_name")])
+            for field in ["subj", "obj"]
+        ]
+        if isinstance(self.data, TableQuerysetData):
+            self.data.data = self.data.data.prefetch_related(*prefetches)
+        else:
+            prefetch_related_objects(self.data.data, *prefetches)
@@ -0,0 +1,273 @@
+import base64
+import json
+from io import StringIO
+from unittest import mock
+
+import django_tables2 as tables
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django_filters.filterset import filterset_factory
+
+from apis_ontology.api_views import RELATION_TYPES_CACHE_KEY
+from apis_ontology.filtersets import (
+    PersonFilterSet,
+    SubqueryModelMultipleChoiceFilter,
+)
+from apis_ontology.models import (
+    CacheVersion,
+    Person,
+    PersonPlaceLegacyRelation,
+    Place,
+    Profession,
+    Source,
+)
+from apis_ontology.querysets import PersonListViewQueryset
+from apis_ontology.tables import PersonTable
+
+PERSON_API = "/apis/api/apis_ontology.person/"
+CURSOR_API = "/apis/api/cursor/apis_ontology.person/"
+
+
+class PersonTextFieldsTestCase(TestCase):
+    """Test cases for loading the biography text fields of persons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin")
+        cls.person = Person.objects.create(
+            forename="Bruno", surname="Kreisky", oebl_haupttext="Politiker"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_api_list(self):
+        """Test that lists only contain the text fields if requested."""
+        results = self.client.get(PERSON_API).json()["results"]
+        self.assertNotIn("oebl_haupttext", results[0])
+        results = self.client.get(
+            PERSON_API, {"fields": "surname,oebl_haupttext"}
+        ).json()["results"]
+        self.assertEqual(
+            results[0], {"surname": "Kreisky", "oebl_haupttext": "Politiker"}
+        )
+
+    def test_api_detail(self):
+        """Test that the detail endpoint contains all the fields."""
+        data = self.client.get(f"{PERSON_API}{self.person.pk}/").json()
+        self.assertEqual(data["oebl_haupttext"], "Politiker")
+        self.assertIn("oebl_kurzinfo", data)
+
+    def test_table_selected_columns(self):
+        """Test that text fields selected as columns are not deferred."""
+        table = PersonTable(
+            PersonListViewQueryset(Person.objects.all()),
+            extra_columns=[("oebl_haupttext", tables.Column())],
+        )
+        (person,) = table.data
+        self.assertNotIn("oebl_haupttext", person.get_deferred_fields())
+        self.assertIn("oebl_werkverzeichnis", person.get_deferred_fields())
+
+    def test_table_queries(self):
+        """Test that a page of the table loads the sources at once."""
+        for i in range(50):
+            person = Person.objects.create(surname=f"Nachname {i}")
+            Source.objects.create(
+                orig_filename=f"Nachname_{i}.xml", content_object=person
+            )
+        request = RequestFactory().get("/")
+        request.user = self.user
+        table = PersonTable(PersonListViewQueryset(Person.objects.all()))
+        table.paginate(per_page=50)
+        # the page of persons and their sources, the paginator counted before
+        with self.assertNumQueries(2):
+            html = table.as_html(request)
+        self.assertIn("Nachname_0.xml", html)
+
+
+class ProfessionFilterTestCase(TestCase):
+    """Test cases for filtering persons by their many to many fields."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jurist, cls.politiker = [
+            Profession.objects.create(name=name) for name in ["Jurist", "Politiker"]
+        ]
+        cls.kreisky = Person.objects.create(forename="Bruno", surname="Kreisky")
+        cls.kreisky.profession.add(cls.jurist, cls.politiker)
+        cls.figl = Person.objects.create(forename="Leopold", surname="Figl")
+        cls.figl.profession.add(cls.politiker)
+        cls.demel = Person.objects.create(forename="Anna", surname="Demel")
+
+    def filter(self, value, **kwargs):
+        profession_filter = SubqueryModelMultipleChoiceFilter(
+            field_name="profession", queryset=Profession.objects.all(), **kwargs
+        )
+        return set(profession_filter.filter(Person.objects.all(), value))
+
+    def test_filterset(self):
+        """Test that the filter neither duplicates persons nor uses DISTINCT."""
+        filterset_class = filterset_factory(Person, PersonFilterSet)
+        filterset = filterset_class(
+            {"profession": [self.jurist.pk, self.politiker.pk]}, Person.objects.all()
+        )
+        self.assertIsInstance(
+            filterset.filters["profession"], SubqueryModelMultipleChoiceFilter
+        )
+        self.assertNotIn("DISTINCT", str(filterset.qs.query))
+        self.assertCountEqual(filterset.qs, [self.kreisky, self.figl])
+
+    def test_options(self):
+        """Test that the options of the filter are applied to the subquery."""
+        both = [self.jurist, self.politiker]
+        self.assertEqual(self.filter(both), {self.kreisky, self.figl})
+        self.assertEqual(self.filter(both, conjoined=True), {self.kreisky})
+        self.assertEqual(
+            self.filter([self.jurist], exclude=True), {self.figl, self.demel}
+        )
+        self.assertEqual(self.filter(["null"], null_value="null"), {self.demel})
+        self.assertEqual(self.filter([]), {self.kreisky, self.figl, self.demel})
+
+    def test_benchmark(self):
+        """Test that the benchmark leaves no persons behind."""
+        out = StringIO()
+        call_command(
+            "benchmark_person_filters", persons=20, professions=5, repeat=1, stdout=out
+        )
+        self.assertIn("join and distinct:", out.getvalue())
+        self.assertIn("subquery:", out.getvalue())
+        self.assertEqual(Person.objects.count(), 3)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Test cases for the keyset paginated API list endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin")
+        names = [
+            ("Kreisky", "Bruno"),
+            ("Kreisky", None),
+            ("Kreisky", "Bruno"),
+            ("Adler", "Victor"),
+            ("", "Anonymus"),
+            ("Adler", None),
+            ("Zweig", "Stefan"),
+        ]
+        for surname, forename in names:
+            Person.objects.create(surname=surname, forename=forename)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_walk(self):
+        """Test that walking the pages returns every person once, in order."""
+        ids = []
+        url = f"{CURSOR_API}?limit=2"
+        while url:
+            data = self.client.get(url).json()
+            ids += [
+                int(result["url"].rstrip("/").rsplit("/", 1)[1])
+                for result in data["results"]
+            ]
+            url = data["next"]
+        expected = Person.objects.order_by(
+            F("surname").asc(nulls_last=True),
+            F("forename").asc(nulls_last=True),
+            "pk",
+        ).values_list("pk", flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_invalid_cursor(self):
+        """Test that cursors that can not be decoded are rejected."""
+        cursors = ["x", {"surname": "Kreisky"}, ["Kreisky"], ["Kreisky", {}, 1]]
+        for cursor in cursors:
+            if not isinstance(cursor, str):
+                cursor = base64.urlsafe_b64encode(json.dumps(cursor).encode())
+                cursor = cursor.decode()
+            response = self.client.get(CURSOR_API, {"cursor": cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class RelationTypesTestCase(TestCase):
+    """Test cases for the relation types endpoint."""
+
+    url = "/apis/api/listrelationtypes"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin")
+        cls.person = Person.objects.create(forename="Bruno", surname="Kreisky")
+        cls.place = Place.objects.create(label="Wien")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_etag(self):
+        """Test that clients polling with the ETag get a 304."""
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidation(self):
+        """Test that saving a legacy relation changes the version."""
+        etag = self.client.get(self.url)["ETag"]
+        self.person.save()
+        self.assertEqual(CacheVersion.get(RELATION_TYPES_CACHE_KEY), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            PersonPlaceLegacyRelation.objects.create(
+                subj=self.person,
+                obj=self.place,
+                legacy_relation_vocab_label="geboren in",
+                legacy_relation_vocab_label_reverse="Geburtsort von",
+            )
+        self.assertEqual(CacheVersion.get(RELATION_TYPES_CACHE_KEY), 1)
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["relations"]["personplacelegacyrelation"]["possible_types"],
+            [{"forward": "geboren in", "reverse": "Geburtsort von"}],
+        )
+
+    def create_relations(self, *labels):
+        return [
+            PersonPlaceLegacyRelation.objects.create(
+                subj=self.person, obj=self.place, legacy_relation_vocab_label=label
+            )
+            for label in labels
+        ]
+
+    def test_invalidation_once_per_transaction(self):
+        """Test that the version is increased once per transaction."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            relation, other = self.create_relations("geboren in", "gestorben in")
+            relation.legacy_relation_vocab_label = "getauft in"
+            relation.save()
+            other.delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(CacheVersion.get(RELATION_TYPES_CACHE_KEY), 1)
+
+    def test_unchanged_labels(self):
+        """Test that saving without changing the labels keeps the version."""
+        (relation,) = self.create_relations("geboren in")
+        relation = PersonPlaceLegacyRelation.objects.get(pk=relation.pk)
+        with mock.patch.object(CacheVersion, "increment_on_commit") as increment:
+            relation.notes = "Geburtshaus"
+            relation.save()
+            increment.assert_not_called()
+            relation.legacy_relation_vocab_label = "getauft in"
+            relation.save()
+            increment.assert_called_once_with(RELATION_TYPES_CACHE_KEY)
+
+    def test_single_lookup(self):
+        """Test that the relation types are looked up once per request."""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        table = CacheVersion._meta.db_table
+        queries = [query for query in context if table in query["sql"]]
+        self.assertEqual(len(queries), 1)
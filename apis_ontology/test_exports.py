@@ -0,0 +1,97 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from rdflib import RDF, RDFS, Graph, Literal, Namespace
+
+from apis_ontology.models import Institution, Person, PersonInstitutionLegacyRelation
+
+CRM = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
+
+
+def subjects_of_type(graph, rdf_type):
+    # the last two path segments of the uris, the model and the primary key
+    return {
+        tuple(str(subject).split("/")[-2:])
+        for subject in graph.subjects(RDF.type, rdf_type)
+    }
+
+
+class ExportCidocTestCase(TestCase):
+    """Test cases for the `export_cidoc` command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kreisky = Person.objects.create(forename="Bruno", surname="Kreisky")
+        cls.zweig = Person.objects.create(forename="Stefan", surname="Zweig")
+        cls.institution = Institution.objects.create(label="Universität Wien")
+        PersonInstitutionLegacyRelation.objects.create(
+            subj=cls.kreisky, obj=cls.institution
+        )
+
+    def export(self, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "export"
+            call_command(
+                "export_cidoc", output=str(output), stderr=StringIO(), **options
+            )
+            return Graph().parse(output, format=options.get("format", "nt"))
+
+    def test_export(self):
+        """Test that the graph contains the persons, institutions and relations."""
+        graph = self.export(chunk_size=1)
+        self.assertEqual(
+            subjects_of_type(graph, CRM.E21_Person),
+            {
+                ("apis_ontology.person", str(self.kreisky.pk)),
+                ("apis_ontology.person", str(self.zweig.pk)),
+            },
+        )
+        self.assertIn((None, RDFS.label, Literal("Stefan Zweig")), graph)
+        self.assertIn((None, RDFS.label, Literal("Universität Wien")), graph)
+        self.assertEqual(len(set(graph.subjects(RDF.type, CRM.E85_Joining))), 1)
+
+    def test_turtle(self):
+        """Test that the turtle export contains the same graph."""
+        self.assertEqual(len(self.export(format="ttl")), len(self.export()))
+
+
+class ExportRelationsCidocTestCase(TransactionTestCase):
+    """
+    Test cases for the `export_relations_cidoc` command. The worker
+    processes use their own database connections, so the test data
+    has to be committed.
+    """
+
+    def setUp(self):
+        institutions = [
+            Institution.objects.create(label=label)
+            for label in ["Universität Wien", "Burgtheater"]
+        ]
+        for forename, surname in [("Bruno", "Kreisky"), ("Stefan", "Zweig")]:
+            person = Person.objects.create(forename=forename, surname=surname)
+            for institution in institutions:
+                PersonInstitutionLegacyRelation.objects.create(
+                    subj=person, obj=institution
+                )
+
+    def export(self, workers):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "export.nt"
+            call_command(
+                "export_relations_cidoc",
+                output=str(output),
+                workers=workers,
+                partition_size=1,
+                stderr=StringIO(),
+            )
+            return output.read_bytes()
+
+    def test_workers(self):
+        """Test that the output does not depend on the number of workers."""
+        output = self.export(workers=1)
+        self.assertEqual(self.export(workers=2), output)
+        graph = Graph().parse(data=output, format="nt")
+        self.assertEqual(len(set(graph.subjects(RDF.type, CRM.E85_Joining))), 4)
@@ -0,0 +1,809 @@
+import csv
+import datetime
+import importlib
+import json
+import tempfile
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from apis_highlighter.models import Annotation
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apis_core.relations.models import Relation
+from apis_ontology.api_views import RELATION_TYPES_CACHE_KEY
+from apis_ontology.legacy import (
+    CachedSession,
+    OfflineError,
+    RevisionIndex,
+    fetch_pages,
+    iter_json_items,
+    legacy_session,
+    write_json_items,
+)
+from apis_ontology.management.commands import (
+    copy_triples_to_ng_relations,
+    tranche12,
+    tranche12_2,
+)
+from apis_ontology.models import (
+    CacheVersion,
+    Person,
+    PersonPersonLegacyRelation,
+    PersonPlaceLegacyRelation,
+    Place,
+    Profession,
+    RelationEdge,
+    Source,
+    WarGeschwisterVon,
+)
+
+legacy_import = importlib.import_module("apis_ontology.management.commands.import")
+import_relations = importlib.import_module(
+    "apis_ontology.management.commands.02_import_relations"
+)
+import_annotations = importlib.import_module(
+    "apis_ontology.management.commands.03_import_annotations"
+)
+
+COUNT = 95
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves a paginated list endpoint like the one of the legacy API. The
+    first request for every page fails, to check that it is retried.
+    """
+
+    failed = set()
+    requests = 0
+
+    def do_GET(self):
+        StubHandler.requests += 1
+        query = parse_qs(urlsplit(self.path).query)
+        limit = int(query["limit"][0])
+        offset = int(query["offset"][0])
+        if offset not in self.failed:
+            self.failed.add(offset)
+            self.send_response(503)
+            self.end_headers()
+            return
+        results = [{"id": i} for i in range(offset, min(offset + limit, COUNT))]
+        body = json.dumps({"count": COUNT, "results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LegacyFetchTestCase(SimpleTestCase):
+    """Test cases for fetching data from the legacy API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/entities/person/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubHandler.failed = set()
+        StubHandler.requests = 0
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_file = Path(self.tmpdir.name) / "cache.sqlite"
+        self.session = legacy_session(
+            backoff_factor=0, workers=3, cache_file=self.cache_file
+        )
+
+    def tearDown(self):
+        self.session.close()
+        self.tmpdir.cleanup()
+
+    def test_fetch_pages(self):
+        """Test that all pages are fetched, in order and despite failures."""
+        pages = list(fetch_pages(self.url, self.session, limit=10, workers=3))
+        ids = [result["id"] for page in pages for result in page["results"]]
+        self.assertEqual(len(pages), 10)
+        self.assertEqual(ids, list(range(COUNT)))
+
+    def test_fetch_pages_offset(self):
+        """Test that fetching pages can start at an offset."""
+        pages = fetch_pages(self.url, self.session, limit=10, offset=90, workers=3)
+        ids = [result["id"] for page in pages for result in page["results"]]
+        self.assertEqual(ids, list(range(90, COUNT)))
+
+    def test_cached_replay(self):
+        """Test that cached pages are replayed without network calls."""
+        list(fetch_pages(self.url, self.session, limit=10, workers=3))
+        requests = StubHandler.requests
+        offline = CachedSession(self.cache_file, offline=True)
+        pages = list(fetch_pages(self.url, offline, limit=10, workers=3))
+        ids = [result["id"] for page in pages for result in page["results"]]
+        self.assertEqual(ids, list(range(COUNT)))
+        self.assertEqual(StubHandler.requests, requests)
+        with self.assertRaises(OfflineError):
+            offline.get(f"{self.url}?format=json&limit=20&offset=0")
+        offline.close()
+
+    def test_write_json_items(self):
+        """Test that items written to disk can be read back."""
+        items = {str(i): {"text": f"text {i}"} for i in range(10)}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "texts.json"
+            write_json_items(path, items.items())
+            self.assertEqual(json.loads(path.read_text()), items)
+            self.assertEqual(dict(iter_json_items(path)), items)
+
+    def test_revision_index(self):
+        """Test that the index keeps the timestamp and user of revisions."""
+        revisions = [
+            ("1", {"model": "person", "timestamp": "2017-01-01", "user": 3}),
+            ("2", {"model": "person", "timestamp": "2018-01-01", "user": 4}),
+            ("3", {"model": "place", "timestamp": "2019-01-01", "data": "x"}),
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "reversion.json"
+            write_json_items(path, revisions)
+            index = RevisionIndex(path)
+        self.assertEqual(index.get("person", 1), {"timestamp": "2017-01-01", "user": 3})
+        self.assertEqual(
+            index.get("place", "3"), {"timestamp": "2019-01-01", "user": None}
+        )
+        self.assertIsNone(index.get("person", 3))
+        self.assertEqual(index.users, {3, 4})
+
+
+class ImportCheckpointTestCase(SimpleTestCase):
+    """Test cases for the checkpoints of the legacy entity import."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        for name in ["checkpoint_file", "pages_file"]:
+            path = Path(tmpdir.name) / getattr(legacy_import, name).name
+            patcher = mock.patch.object(legacy_import, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def page(self, result_id):
+        return {
+            "result_ids": [result_id],
+            "sources": {str(result_id): [1, result_id]},
+            "collections": {"Gelehrte": [[1, result_id]]},
+            "titles": {"Dr.": [result_id]},
+            "text_to_entity_mapping": {},
+        }
+
+    def test_resume(self):
+        """Test that the pages after the last checkpoint are dropped."""
+        checkpoint = legacy_import.load_checkpoint()
+        for offset, result_id in [(1000, 1), (2000, 2)]:
+            checkpoint["offsets"]["person"] = offset
+            legacy_import.save_checkpoint(checkpoint, self.page(result_id))
+        size = legacy_import.checkpoint_file.stat().st_size
+        # an interrupted import wrote a page, but not the checkpoint
+        with legacy_import.pages_file.open("a") as f:
+            f.write(json.dumps(self.page(3)) + "\n")
+
+        checkpoint = legacy_import.load_checkpoint()
+        self.assertEqual(checkpoint["offsets"], {"person": 2000})
+        legacy_import.save_checkpoint(checkpoint, self.page(4))
+        # the checkpoint only contains the offsets
+        self.assertEqual(legacy_import.checkpoint_file.stat().st_size, size)
+
+        pages = legacy_import.load_pages()
+        self.assertEqual(pages["result_ids"], {1, 2, 4})
+        self.assertEqual(pages["titles"], {"Dr.": [1, 2, 4]})
+        self.assertEqual(pages["sources"], {"1": [1, 1], "2": [1, 2], "4": [1, 4]})
+
+
+class ImportSourcesTestCase(TestCase):
+    """Test cases for importing the sources of the legacy entities."""
+
+    def test_import_sources(self):
+        """Test that the sources of the imported entities are written."""
+        person = Person.objects.create(forename="Bruno", surname="Kreisky")
+        content_type = ContentType.objects.get_for_model(Person)
+        Source.objects.create(pk=2, orig_filename="Kreisky_Bruno_1911.xml")
+        sources = {
+            "1": {
+                "orig_filename": "Adler_Victor_1852.xml",
+                "pubinfo": "",
+                "author": "",
+            },
+            "2": {
+                "orig_filename": "Kreisky_Bruno_1911.xml",
+                "pubinfo": "ÖBL",
+                "author": "",
+            },
+        }
+        legacy_import.import_sources(sources, {"2": [content_type.pk, person.pk]})
+        (source,) = Source.objects.all()
+        self.assertEqual(source.content_object, person)
+        self.assertEqual(source.pubinfo, "ÖBL")
+
+
+class SaveEntitiesTestCase(TestCase):
+    """Test cases for saving the entities of a page of the legacy API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = Person.objects.create(forename="Bruno", surname="Kreiski")
+        cls.jurist = Profession.objects.create(name="Jurist")
+        cls.politiker = Profession.objects.create(name="Politiker")
+
+    def test_save_entities(self):
+        """Test that the history contains the professions of the persons."""
+        updated = Person.objects.get(pk=self.existing.pk)
+        updated.surname = "Kreisky"
+        created = Person(pk=self.existing.pk + 1000, forename="Anna", surname="Demel")
+        for person in [updated, created]:
+            person._history_date = datetime.datetime(2017, 12, 31)
+        professions = [
+            (updated.pk, self.jurist.pk),
+            (updated.pk, self.politiker.pk),
+            (created.pk, self.politiker.pk),
+        ]
+        legacy_import.save_entities(
+            Person, [updated, created], {updated.pk: updated}, professions
+        )
+
+        updated.refresh_from_db()
+        self.assertEqual(updated.display_name, "Bruno Kreisky")
+        record = updated.history.get(history_date__year=2017)
+        self.assertEqual(record.history_type, "~")
+        self.assertEqual(
+            sorted(row.profession.name for row in record.profession.all()),
+            ["Jurist", "Politiker"],
+        )
+        (record,) = Person.objects.get(pk=created.pk).history.all()
+        self.assertEqual(record.history_type, "+")
+        self.assertEqual(
+            [row.profession.name for row in record.profession.all()], ["Politiker"]
+        )
+
+
+class ProfessionMatchingTestCase(TestCase):
+    """Test cases for matching the professions of the imported persons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Profession.objects.bulk_create(
+            [Profession(name=f"Beruf {i}", oldids=f"{i}\n{i + 100}") for i in range(30)]
+        )
+
+    def import_page(self, first_id, professions):
+        results = [
+            {
+                "id": first_id + i,
+                "url": f"{first_id + i}",
+                "name": "Kreisky",
+                "first_name": "Bruno",
+                "profession": [{"id": oldid} for oldid in professions],
+                "source": None,
+                "text": [],
+            }
+            for i in range(10)
+        ]
+        revisions = mock.Mock(**{"get.return_value": None})
+        with CaptureQueriesContext(connection) as queries:
+            legacy_import.import_entity_page(
+                Person, results, {}, revisions, {}, {}, self.profession_cache
+            )
+        return len(queries)
+
+    def test_queries(self):
+        """Test that matching professions does not need any queries."""
+        with self.assertNumQueries(1):
+            self.profession_cache = legacy_import.profession_index()
+        # the first page looks up the content types
+        self.import_page(100, [])
+        one = self.import_page(1000, [1])
+        many = self.import_page(2000, [2, 103, 4, 105, 6, 107, 8, 109, 10])
+        self.assertEqual(one, many)
+        self.assertEqual(
+            Person.objects.get(pk=2000).profession.count(),
+            len({2, 103, 4, 105, 6, 107, 8, 109, 10}),
+        )
+
+
+class Tranche12TestCase(TestCase):
+    """Test cases for writing the persons of the 12th tranche."""
+
+    def test_write(self):
+        """Test that the history is written by `tranche12_2`, with the professions."""
+        batch = [
+            {
+                "person": {"forename": "Anna", "surname": "Demel"},
+                "professions": ["Konditorin", "Unternehmerin"],
+                "professioncategory": None,
+                "source": {"orig_filename": "Demel_Anna_1872.xml"},
+                "uris": ["https://example.org/demel"],
+                "date": datetime.datetime(2024, 7, 15).isoformat(),
+            }
+        ]
+        tranche12.write(batch, defaultdict(float))
+        person = Person.objects.get(surname="Demel")
+        self.assertFalse(person.history.exists())
+
+        tranche12_2.write(batch, defaultdict(float))
+        (record,) = person.history.all()
+        self.assertEqual(record.history_date.date(), datetime.date(2024, 7, 15))
+        self.assertEqual(
+            sorted(row.profession.name for row in record.profession.all()),
+            ["Konditorin", "Unternehmerin"],
+        )
+
+
+class Tranche12ParseTestCase(SimpleTestCase):
+    """Test cases for parsing the files of the 12th tranche."""
+
+    def test_parse_files(self):
+        """Test that the files are parsed in order and yielded in batches."""
+        files = [f"{i}.xml" for i in range(7)]
+        timings = defaultdict(float)
+        with mock.patch.object(tranche12, "parse", str.upper):
+            batches = list(tranche12.parse_files(files, 2, 3, timings))
+        self.assertEqual(
+            batches,
+            [["0.XML", "1.XML", "2.XML"], ["3.XML", "4.XML", "5.XML"], ["6.XML"]],
+        )
+        self.assertIn("parse", timings)
+
+
+VOCABULARIES = {
+    "personperson": [
+        {"id": 1, "name": "Familie", "name_reverse": "Familie"},
+        {
+            "id": 2,
+            "name": "ist Vater von",
+            "name_reverse": "ist Kind von",
+            "parent_class": {"id": 1},
+        },
+    ],
+    "personplace": [{"id": 3, "name": "geboren in", "name_reverse": "Geburtsort von"}],
+}
+
+
+def relation_vocabulary(vocab):
+    terms = {term["id"]: term for term in VOCABULARIES.get(vocab, [])}
+    names = {"name": defaultdict(list), "name_reverse": defaultdict(list)}
+    for term in terms.values():
+        for field, index in names.items():
+            index[term[field]].append(term["id"])
+    return terms, names
+
+
+class CopyRelationsTestCase(TestCase):
+    """Test cases for copying the legacy relations to the relation classes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vater = Person.objects.create(forename="Johann", surname="Strauss")
+        cls.sohn = Person.objects.create(forename="Josef", surname="Strauss")
+        cls.wien = Place.objects.create(label="Wien")
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = Path(tmpdir.name)
+        revisions_file = self.tmpdir / "reversion.json"
+        write_json_items(
+            revisions_file,
+            [
+                (
+                    "10",
+                    {
+                        "model": "personperson",
+                        "timestamp": "2018-03-01T10:00:00",
+                        "user": "redaktion",
+                    },
+                )
+            ],
+        )
+        for target, value in [
+            ("relation_vocabulary", relation_vocabulary),
+            ("relations_file", self.tmpdir / "relations.json"),
+            ("checkpoint_file", self.tmpdir / "checkpoint.json"),
+            ("RevisionIndex", lambda: RevisionIndex(revisions_file)),
+        ]:
+            patcher = mock.patch.object(copy_triples_to_ng_relations, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        copy_triples_to_ng_relations.fetch_relation_from_api.cache_clear()
+        self.addCleanup(
+            copy_triples_to_ng_relations.fetch_relation_from_api.cache_clear
+        )
+
+    def relation(self, type, name, subj, obj, start=None):
+        return {
+            "type": type,
+            "name": name,
+            "subj": subj.pk,
+            "obj": obj.pk,
+            "review": False,
+            "status": None,
+            "references": None,
+            "notes": "",
+            "start_date_written": start,
+            "end_date_written": None,
+        }
+
+    def relations(self):
+        return [
+            (
+                "10",
+                self.relation("personperson", "ist Vater von", self.vater, self.sohn),
+            ),
+            (
+                "11",
+                self.relation(
+                    "personplace", "geboren in", self.sohn, self.wien, "1827"
+                ),
+            ),
+            (
+                "12",
+                {
+                    **self.relation("personplace", "geboren in", self.sohn, self.wien),
+                    "subj": 0,
+                },
+            ),
+            (
+                "13",
+                self.relation(
+                    "personperson", "war Geschwister von [PIO]", self.sohn, self.vater
+                ),
+            ),
+        ]
+
+    def copy(self, relations, **options):
+        write_json_items(self.tmpdir / "relations.json", relations)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("copy_triples_to_ng_relations", stdout=StringIO(), **options)
+
+    def test_copy(self):
+        """Test that the relations are copied with their labels, dates and history."""
+        version = CacheVersion.get(RELATION_TYPES_CACHE_KEY)
+        self.copy(self.relations(), chunk_size=2)
+
+        relations = {
+            relation.pk: relation
+            for relation in Relation.objects.select_subclasses().order_by("pk")
+        }
+        self.assertEqual(list(relations), [10, 11, 13])
+        self.assertIsInstance(relations[10], PersonPersonLegacyRelation)
+        self.assertEqual(
+            relations[10].legacy_labels(),
+            ("Familie >> ist Vater von", "Familie >> ist Kind von"),
+        )
+        self.assertEqual(relations[10].subj, self.vater)
+        self.assertIsInstance(relations[11], PersonPlaceLegacyRelation)
+        self.assertEqual(relations[11].start_date_sort.year, 1827)
+        self.assertIsInstance(relations[13], WarGeschwisterVon)
+
+        (record,) = relations[10].history.all()
+        self.assertEqual(record.history_type, "+")
+        self.assertEqual(record.history_date.year, 2018)
+        self.assertEqual(record.history_user, User.objects.get(username="redaktion"))
+        self.assertEqual(relations[11].history.get().history_date.year, 2017)
+
+        self.assertEqual(
+            sorted(RelationEdge.objects.values_list("relation_id", flat=True)),
+            [10, 13],
+        )
+        self.assertGreater(CacheVersion.get(RELATION_TYPES_CACHE_KEY), version)
+        self.assertFalse((self.tmpdir / "checkpoint.json").exists())
+
+    def test_update(self):
+        """Test that copying the relations again updates them."""
+        relations = self.relations()
+        self.copy(relations)
+        relations[1][1]["start_date_written"] = "1830"
+        self.copy(relations)
+        self.assertEqual(Relation.objects.count(), 3)
+        relation = PersonPlaceLegacyRelation.objects.get(pk=11)
+        self.assertEqual(relation.start_date_sort.year, 1830)
+        self.assertEqual(
+            list(relation.history.values_list("history_type", flat=True)), ["~", "+"]
+        )
+
+    def test_resume(self):
+        """Test that an interrupted run continues after the checkpoint."""
+        (self.tmpdir / "checkpoint.json").write_text(json.dumps({"position": 2}))
+        self.copy(self.relations(), chunk_size=1)
+        self.assertEqual(list(Relation.objects.values_list("pk", flat=True)), [13])
+
+    def test_import_relations(self):
+        """Test that the relations are downloaded and copied to the relation classes."""
+        result = (
+            {
+                "id": 20,
+                "relation_type": {"id": 2, "url": "https://example.org/vocabulary/2"},
+                "related_personA": {"id": self.vater.pk},
+                "related_personB": {"id": self.sohn.pk},
+            }
+            | {field: None for field in import_relations.COPYFIELDS}
+            | {"review": True}
+        )
+
+        def get(url):
+            if url.startswith("https://example.org/vocabulary/"):
+                data = {"name": "ist Vater von", "name_reverse": "ist Kind von"}
+            else:
+                results = [result] if "/relations/personperson/" in url else []
+                data = {"count": len(results), "results": results}
+            return mock.Mock(**{"json.return_value": data})
+
+        session = mock.Mock(get=get)
+        with (
+            mock.patch.object(import_relations, "shared_session", return_value=session),
+            mock.patch.object(
+                import_relations, "relations_file", self.tmpdir / "relations.json"
+            ),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            call_command("02_import_relations", stdout=StringIO())
+        relation = Relation.objects.select_subclasses().get()
+        self.assertEqual(relation.pk, 20)
+        self.assertEqual(
+            relation.legacy_labels(),
+            ("Familie >> ist Vater von", "Familie >> ist Kind von"),
+        )
+
+    def test_queries(self):
+        """Test that the number of queries does not depend on the chunk size."""
+        revisions = mock.Mock(**{"get.return_value": None})
+        relation_classes = copy_triples_to_ng_relations.legacy_relation_classes()
+
+        def queries(relations):
+            with CaptureQueriesContext(connection) as queries:
+                copy_triples_to_ng_relations.copy_relations(
+                    relations, relation_classes, revisions, {}
+                )
+            return len(queries)
+
+        relations = [
+            (
+                str(pk),
+                self.relation("personperson", "ist Vater von", self.vater, self.sohn),
+            )
+            for pk in range(100, 120)
+        ]
+        # the first chunk looks up the content types
+        queries(relations[:1])
+        self.assertEqual(queries(relations[1:2]), queries(relations[2:]))
+
+
+VOCABULARY = [
+    {"id": 1, "name": "Familie", "name_reverse": "Familie"},
+    {
+        "id": 2,
+        "name": "Eltern",
+        "name_reverse": "Kinder",
+        "parent_class": {"id": 1},
+    },
+    {
+        "id": 3,
+        "name": "ist Vater von",
+        "name_reverse": "ist Kind von",
+        "parent_class": {"id": 2},
+    },
+    {
+        "id": 4,
+        "name": "ist Mutter von",
+        "name_reverse": "ist Kind von",
+        "parent_class": {"id": 2},
+    },
+    {"id": 5, "name": "Beruf", "name_reverse": "Beruf"},
+]
+
+
+class VocabularySession:
+    """
+    Serves the vocabulary endpoint of the legacy API, both as the pages
+    downloaded by `relation_vocabulary` and filtered by `id` or name,
+    like the queries of the former per term lookup.
+    """
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, params=None):
+        self.urls.append(url)
+        query = {
+            key: values[0] for key, values in parse_qs(urlsplit(url).query).items()
+        }
+        query |= params or {}
+        results = [
+            term
+            for term in VOCABULARY
+            if all(
+                str(term.get(key)) == str(value)
+                for key, value in query.items()
+                if key in ["id", "name", "name_reverse"]
+            )
+        ]
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", len(results)))
+        return mock.Mock(
+            status_code=200,
+            **{
+                "json.return_value": {
+                    "count": len(results),
+                    "results": results[offset : offset + limit],
+                }
+            },
+        )
+
+
+def fetch_relation_per_term(session, term, vocab, field="name"):
+    """
+    The former lookup of vocabulary labels, which queried the API
+    for every term and for every parent of a term.
+    """
+    try:
+        query = {"id": int(term), "format": "json"}
+    except ValueError:
+        query = {field: term, "format": "json"}
+    url = f"https://apis.acdh.oeaw.ac.at/apis/api/vocabularies/{vocab}relation/"
+    data = session.get(url, params=query).json()
+    if data["count"] != 1:
+        return None, None
+    label = data["results"][0]["name"]
+    label_reverse = data["results"][0]["name_reverse"]
+    if result := data["results"][0].get("parent_class"):
+        res_2, res_2_reverse = fetch_relation_per_term(
+            session, str(result["id"]), vocab, field
+        )
+        label = f"{res_2} >> {label}"
+        label_reverse = f"{res_2_reverse} >> {label_reverse}"
+    return label, label_reverse
+
+
+class RelationVocabularyTestCase(SimpleTestCase):
+    """Test cases for resolving the labels of the legacy relation vocabularies."""
+
+    def setUp(self):
+        self.session = VocabularySession()
+        patcher = mock.patch(
+            "apis_ontology.legacy.shared_session", return_value=self.session
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for function in [
+            copy_triples_to_ng_relations.relation_vocabulary,
+            copy_triples_to_ng_relations.fetch_relation_from_api,
+        ]:
+            function.cache_clear()
+            self.addCleanup(function.cache_clear)
+
+    def test_labels(self):
+        """Test that the labels match the ones of the former per term lookup."""
+        terms = [str(term["id"]) for term in VOCABULARY] + [
+            "ist Vater von",
+            "ist Kind von",
+            "Familie",
+            "unbekannt",
+            "99",
+            "war Geschwister von [PIO]",
+        ]
+        for field in ["name", "name_reverse"]:
+            for term in terms:
+                with self.subTest(term=term, field=field):
+                    expected = (
+                        (None, None)
+                        if "PIO" in term
+                        else fetch_relation_per_term(
+                            self.session, term, "personperson", field
+                        )
+                    )
+                    self.assertEqual(
+                        copy_triples_to_ng_relations.fetch_relation_from_api(
+                            term, "personperson", field
+                        ),
+                        expected,
+                    )
+        self.assertEqual(
+            copy_triples_to_ng_relations.fetch_relation_from_api("3", "personperson"),
+            ("Familie >> Eltern >> ist Vater von", "Familie >> Kinder >> ist Kind von"),
+        )
+
+    def test_offline(self):
+        """Test that a vocabulary is downloaded once and resolved in memory."""
+        for term in ["3", "4", "ist Mutter von", "Beruf"]:
+            copy_triples_to_ng_relations.fetch_relation_from_api(term, "personperson")
+        self.assertEqual(len(self.session.urls), 1)
+
+
+class ImportAnnotationsTestCase(TestCase):
+    """Test cases for importing the annotations of the legacy instance."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("sennierer")
+        cls.vater = Person.objects.create(forename="Johann", surname="Strauss")
+        cls.sohn = Person.objects.create(forename="Josef", surname="Strauss")
+        cls.relation = PersonPersonLegacyRelation.objects.create(
+            pk=500, subj=cls.vater, obj=cls.sohn
+        )
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = Path(tmpdir.name)
+        (self.tmpdir / "mapping.json").write_text(
+            json.dumps({"7": {"entity_id": self.sohn.pk, "field_name": "text"}})
+        )
+        with (self.tmpdir / "annotations.csv").open("w") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "id",
+                    "start",
+                    "end",
+                    "text_id",
+                    "content_type_id",
+                    "object_id",
+                    "orig_string",
+                    "user_added_id",
+                    "annotation_project_id",
+                ]
+            )
+            writer.writerows(
+                [
+                    [1, 0, 5, 7, 8, self.vater.pk, "Vater", 12, 3],
+                    [2, 10, 20, 7, 30, self.relation.pk, "Sohn von", 12, 3],
+                    [3, 0, 4, 9, 8, self.vater.pk, "Text", 12, 3],
+                    [4, 0, 4, 7, "", "", "", 12, 3],
+                ]
+            )
+        for target, name in [
+            ("annotations_file", "annotations.csv"),
+            ("mapping_file", "mapping.json"),
+        ]:
+            patcher = mock.patch.object(import_annotations, target, self.tmpdir / name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_read_rows(self):
+        """Test that rows without an object are skipped."""
+        rows = list(import_annotations.read_rows())
+        self.assertEqual([row["id"] for row in rows], ["1", "2", "3"])
+        self.assertEqual(
+            [import_annotations.is_person(row) for row in rows], [True, False, True]
+        )
+
+    def test_import(self):
+        """Test that the annotations refer to the persons and relations."""
+        for _ in range(2):
+            call_command("03_import_annotations", stdout=StringIO())
+        annotations = Annotation.objects.in_bulk()
+        self.assertEqual(list(annotations), [1, 2, 3])
+        self.assertEqual(annotations[1].content_object, self.vater)
+        self.assertEqual(annotations[1].text_content_object, self.sohn)
+        self.assertEqual(annotations[1].user, self.user)
+        self.assertEqual(annotations[1].project_id, 3)
+        self.assertEqual(annotations[2].content_object, self.relation)
+        self.assertEqual(annotations[2].orig_string, "Sohn von")
+        # the text of the third annotation was not imported
+        self.assertIsNone(annotations[3].content_object)
+        self.assertEqual((annotations[3].start, annotations[3].end), (0, 4))
@@ -0,0 +1,125 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse, set_script_prefix
+
+from apis_core.relations.templatetags.relations import relations_from
+from apis_ontology.models import (
+    Person,
+    PersonPersonLegacyRelation,
+    PersonPlaceLegacyRelation,
+    Place,
+    ProfessionCategory,
+    update_person_display_names,
+)
+from apis_ontology.querysets import PersonAutocompleteQueryset, PersonListViewQueryset
+from apis_ontology.tables import OEBLBaseEntityRelationsTable
+
+
+class PersonDisplayNameTestCase(TestCase):
+    """Test cases for keeping the display name of persons up to date."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.person = Person.objects.create(forename="Bruno", surname="Kreiski")
+
+    def display_name(self):
+        return Person.objects.values_list("display_name", flat=True).get(
+            pk=self.person.pk
+        )
+
+    def test_save(self):
+        """Test that the display name is computed when saving."""
+        self.assertEqual(self.display_name(), "Bruno Kreiski")
+
+    def test_save_update_fields(self):
+        """Test that the display name is saved with the names."""
+        self.person.surname = "Kreisky"
+        self.person.save(update_fields=["surname"])
+        self.assertEqual(self.display_name(), "Bruno Kreisky")
+
+        self.person.forename = self.person.surname = ""
+        self.person.alternative_names = [{"name": "Anonymus"}]
+        self.person.save(update_fields=["alternative_names"])
+        self.assertEqual(self.display_name(), "Anonymus")
+
+    def test_queryset_update(self):
+        """Test that the display name can be refreshed after an update."""
+        persons = Person.objects.filter(pk=self.person.pk)
+        persons.update(surname="Kreisky")
+        self.assertEqual(self.display_name(), "Bruno Kreiski")
+        update_person_display_names(persons)
+        self.assertEqual(self.display_name(), "Bruno Kreisky")
+
+
+class PersonDisplayNameQuerysetsTestCase(TestCase):
+    """Test cases for the querysets that only load the display name."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ProfessionCategory.objects.create(name="Politik")
+        cls.kreisky = Person.objects.create(
+            forename="Bruno", surname="Kreisky", professioncategory=category
+        )
+        cls.anonymus = Person.objects.create(alternative_names=[{"name": "Anonymus"}])
+        place = Place.objects.create(label="Wien")
+        PersonPersonLegacyRelation.objects.create(subj=cls.kreisky, obj=cls.anonymus)
+        PersonPlaceLegacyRelation.objects.create(subj=cls.kreisky, obj=place)
+
+    def test_list_view(self):
+        """Test that the list view uses the display name."""
+        persons = list(PersonListViewQueryset(Person.objects.all()))
+        with self.assertNumQueries(0):
+            names = {str(person) for person in persons}
+        self.assertEqual(names, {"Bruno Kreisky", "Anonymus"})
+
+    def test_autocomplete(self):
+        """Test that the autocomplete loads what the results show."""
+        with self.assertNumQueries(1):
+            (person,) = PersonAutocompleteQueryset(Person, "Kreisky")
+            self.assertEqual(str(person), "Bruno Kreisky")
+            self.assertEqual(str(person.professioncategory), "Politik")
+
+    def test_relations_table(self):
+        """Test that the relations table loads the display names at once."""
+        table = OEBLBaseEntityRelationsTable(relations_from(self.kreisky))
+        # the relations, the subject persons and the object persons and places
+        with self.assertNumQueries(4):
+            names = {
+                str(relation.obj if relation.forward else relation.subj)
+                for relation in table.data
+            }
+        self.assertEqual(names, {"Anonymus", "Wien"})
+
+
+class LegacyUriTestCase(TestCase):
+    """Test cases for the detail urls of legacy entities."""
+
+    def test_uri(self):
+        """Test that the uri is the detail url of the instance."""
+        for pk in [1, 10, 100]:
+            person = Person(pk=pk)
+            self.assertEqual(
+                person.uri,
+                reverse("apis_core:generic:detail", args=["apis_ontology.person", pk]),
+            )
+
+    def test_script_prefix(self):
+        """Test that the uri uses the current script prefix."""
+        person = Person(pk=10)
+        uri = person.uri
+        set_script_prefix("/oebl/")
+        try:
+            self.assertEqual(person.uri, f"/oebl{uri}")
+        finally:
+            set_script_prefix("/")
+        self.assertEqual(person.uri, uri)
+
+    def test_benchmark(self):
+        """Test that the benchmark renders both variants and rolls back."""
+        out = StringIO()
+        call_command("benchmark_person_autocomplete", persons=5, repeat=1, stdout=out)
+        self.assertIn("reverse per result:", out.getvalue())
+        self.assertIn("url parts per model:", out.getvalue())
+        self.assertFalse(Person.objects.exists())
@@ -0,0 +1,130 @@
+import importlib
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apis_ontology.models import Person, RelationEdge, WarElternteilVon
+
+relationedge_migration = importlib.import_module(
+    "apis_ontology.migrations.0070_relationedge"
+)
+
+
+class PersonNetworkTestCase(TestCase):
+    """Test cases for the network of relations between persons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("redaktion")
+        cls.persons = [
+            Person.objects.create(forename=forename, surname="Strauss")
+            for forename in ["Johann", "Josef", "Eduard", "Johann III."]
+        ]
+        cls.relations = [
+            WarElternteilVon.objects.create(subj=parent, obj=child)
+            for parent, child in zip(cls.persons, cls.persons[1:])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def network(self, person, **params):
+        return self.client.get(f"/apis/api/network/{person.pk}", params)
+
+    def test_edges(self):
+        """Test that saving a relation updates its edge."""
+        relation = self.relations[0]
+        edge = RelationEdge.objects.get(relation_id=relation.pk)
+        self.assertEqual(edge.subj_object_id, self.persons[0].pk)
+        self.assertEqual(edge.obj_object_id, self.persons[1].pk)
+
+        relation.obj_object_id = self.persons[2].pk
+        relation.save()
+        edge.refresh_from_db()
+        self.assertEqual(edge.obj_object_id, self.persons[2].pk)
+
+        relation.obj_object_id = None
+        relation.save()
+        self.assertFalse(RelationEdge.objects.filter(relation_id=relation.pk).exists())
+
+    def test_migration(self):
+        """Test that the migration creates the edges of existing relations."""
+        edges = list(RelationEdge.objects.order_by("pk").values())
+        RelationEdge.objects.all().delete()
+        # the migration runs with the models of the migration state
+        # that follows it, not with the current models
+        state = MigrationExecutor(connection).loader.project_state(
+            ("apis_ontology", "0070_relationedge")
+        )
+        relationedge_migration.create_relation_edges(
+            state.apps, connection.schema_editor()
+        )
+        self.assertEqual(list(RelationEdge.objects.order_by("pk").values()), edges)
+
+    def test_network(self):
+        """Test that the network contains the persons up to `depth` away."""
+        data = self.network(self.persons[1], depth=1).json()
+        self.assertEqual(
+            [(node["id"], node["depth"]) for node in data["nodes"]],
+            [(self.persons[1].pk, 0), (self.persons[0].pk, 1), (self.persons[2].pk, 1)],
+        )
+        self.assertEqual(
+            sorted(edge["id"] for edge in data["edges"]),
+            [relation.pk for relation in self.relations[:2]],
+        )
+        self.assertEqual(
+            data["edges"][0]["relation_type"], "apis_ontology.warelternteilvon"
+        )
+        self.assertFalse(data["truncated"])
+
+        data = self.network(self.persons[0], depth=3).json()
+        self.assertEqual(len(data["nodes"]), 4)
+        self.assertEqual(len(data["edges"]), 3)
+
+    def test_queries(self):
+        """Test that the network needs one query per hop."""
+        with CaptureQueriesContext(connection) as queries:
+            self.network(self.persons[0], depth=3)
+        hops = [
+            query["sql"]
+            for query in queries.captured_queries
+            if RelationEdge._meta.db_table in query["sql"]
+        ]
+        self.assertEqual(len(hops), 3)
+        for sql in hops:
+            self.assertIn("LIMIT", sql)
+
+    @override_settings(OEBL_NETWORK_MAX_EDGES=5)
+    def test_max_edges(self):
+        """Test that a hop reads at most `OEBL_NETWORK_MAX_EDGES` edges."""
+        hub = self.persons[0]
+        for i in range(10):
+            child = Person.objects.create(forename=f"Kind {i}", surname="Strauss")
+            WarElternteilVon.objects.create(subj=hub, obj=child)
+        data = self.network(hub, depth=1).json()
+        self.assertTrue(data["truncated"])
+        self.assertEqual(len(data["edges"]), 5)
+        self.assertEqual(len(data["nodes"]), 6)
+
+    @override_settings(OEBL_NETWORK_MAX_NODES=2)
+    def test_max_nodes(self):
+        """Test that the network is truncated to `OEBL_NETWORK_MAX_NODES`."""
+        data = self.network(self.persons[0], depth=3).json()
+        self.assertTrue(data["truncated"])
+        self.assertEqual(len(data["nodes"]), 2)
+        self.assertEqual([edge["id"] for edge in data["edges"]], [self.relations[0].pk])
+
+    def test_invalid_depth(self):
+        """Test that depths outside of the limits are rejected."""
+        for depth in ["x", 0, 4]:
+            self.assertEqual(
+                self.network(self.persons[0], depth=depth).status_code, 400
+            )
+
+    def test_anonymous(self):
+        """Test that the network is only available to logged in users."""
+        self.client.logout()
+        self.assertEqual(self.network(self.persons[0]).status_code, 401)
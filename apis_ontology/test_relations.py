@@ -0,0 +1,79 @@
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from apis_ontology.models import (
+    Person,
+    PersonPlaceLegacyRelation,
+    Place,
+    StarbIn,
+    WurdeGeborenIn,
+)
+
+postgresql = skipUnless(
+    connection.vendor == "postgresql", "The index statistics need PostgreSQL"
+)
+
+
+class RelationIndexReportTestCase(TestCase):
+    """Test cases for the `relation_index_report` command."""
+
+    @postgresql
+    def test_report(self):
+        """Test that the report lists the sections and no missing indexes."""
+        out = StringIO()
+        call_command("relation_index_report", min_rows=0, stdout=out)
+        report = out.getvalue()
+        self.assertIn("Statistics collected since", report)
+        self.assertIn("Missing indexes:\n\nTables mostly read", report)
+        self.assertIn("Unused indexes:", report)
+
+    @skipIf(connection.vendor == "postgresql", "The statistics are available")
+    def test_other_databases(self):
+        """Test that the command fails on databases without the statistics."""
+        with self.assertRaises(CommandError):
+            call_command("relation_index_report", stdout=StringIO())
+
+
+class LifeEventPlacesTestCase(TestCase):
+    """Test cases for looking up the birth and death places of persons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.wien, cls.graz, cls.linz = [
+            Place.objects.create(label=label) for label in ["Wien", "Graz", "Linz"]
+        ]
+        cls.mozart = Person.objects.create(forename="Wolfgang", surname="Mozart")
+        cls.haydn = Person.objects.create(forename="Joseph", surname="Haydn")
+        Person.objects.create(forename="Anton", surname="Bruckner")
+
+        WurdeGeborenIn.objects.create(subj=cls.mozart, obj=cls.graz)
+        PersonPlaceLegacyRelation.objects.create(
+            subj=cls.mozart, obj=cls.linz, legacy_relation_vocab_label="geboren in"
+        )
+        PersonPlaceLegacyRelation.objects.create(
+            subj=cls.mozart, obj=cls.linz, legacy_relation_vocab_label="wohnte in"
+        )
+        StarbIn.objects.create(subj=cls.haydn, obj=cls.wien)
+        StarbIn.objects.create(subj=cls.haydn, obj=cls.graz)
+
+    def test_life_event_places(self):
+        """Test the precedence of the relations and the persons without any."""
+        # the serializers look up the content types of the relations when
+        # they are imported, so they can only be imported once the test
+        # database exists
+        from apis_ontology.serializers import life_event_places
+
+        persons = list(Person.objects.values_list("pk", flat=True))
+        with self.assertNumQueries(4):
+            places = life_event_places(persons)
+        self.assertEqual(
+            places,
+            {
+                self.mozart.pk: {"birth": self.linz},
+                self.haydn.pk: {"death": self.wien},
+            },
+        )
@@ -0,0 +1,63 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from apis_ontology.filtersets import PersonFilterSet, PlaceFilterSet
+from apis_ontology.models import Person, Place
+
+postgresql = skipUnless(
+    connection.vendor == "postgresql", "The search filters need PostgreSQL"
+)
+
+
+@postgresql
+class TrigramSearchTestCase(TestCase):
+    """Test cases for the trigram search filters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kreisky = Person.objects.create(forename="Bruno", surname="Kreisky")
+        cls.schnitzler = Person.objects.create(forename="Arthur", surname="Schnitzler")
+        cls.wien = Place.objects.create(label="Wien")
+        cls.graz = Place.objects.create(label="Graz")
+
+    def test_person_search(self):
+        """Test that persons are found by similar names."""
+        filterset = PersonFilterSet({"search": "Kreiski"}, Person.objects.all())
+        self.assertEqual(list(filterset.qs), [self.kreisky])
+
+    def test_person_search_accents(self):
+        """Test that accents are ignored on both sides."""
+        filterset = PersonFilterSet({"search": "Schnítzler"}, Person.objects.all())
+        self.assertEqual(list(filterset.qs), [self.schnitzler])
+
+    def test_place_search(self):
+        """Test that places are found by similar labels."""
+        filterset = PlaceFilterSet({"search": "Wein"}, Place.objects.all())
+        self.assertEqual(list(filterset.qs), [self.wien])
+
+
+@postgresql
+class FulltextSearchTestCase(TestCase):
+    """Test cases for the full text search filter of persons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.strauss = Person.objects.create(
+            forename="Johann", surname="Strauß", oebl_kurzinfo="Komponist"
+        )
+        Person.objects.create(forename="Anton", surname="Strau")
+
+    def search(self, value):
+        filterset = PersonFilterSet({"fulltext": value}, Person.objects.all())
+        return list(filterset.qs)
+
+    def test_sharp_s(self):
+        """Test that the query is unaccented like the search documents."""
+        self.assertEqual(self.search("Strauß"), [self.strauss])
+        self.assertEqual(self.search("Strauss"), [self.strauss])
+
+    def test_text_fields(self):
+        """Test that the biography text fields are searched."""
+        self.assertEqual(self.search("Komponist"), [self.strauss])
@@ -2,7 +2,11 @@ from apis_acdhch_default_settings.urls import urlpatterns
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path
 
-from apis_ontology.api_views import ListRelationTypesAPIView
+from apis_ontology.api_views import (
+    KeysetModelViewSet,
+    ListRelationTypesAPIView,
+    PersonNetworkAPIView,
+)
 
 urlpatterns += [
     path("highlighter/", include("apis_highlighter.urls", namespace="highlighter")),
@@ -12,3 +16,12 @@ urlpatterns += staticfiles_urlpatterns()
 urlpatterns += [path("", include("django_interval.urls"))]
 
 urlpatterns += [path("apis/api/listrelationtypes", ListRelationTypesAPIView.as_view())]
+urlpatterns += [
+    path("apis/api/network/<int:person_id>", PersonNetworkAPIView.as_view())
+]
+urlpatterns += [
+    path(
+        "apis/api/cursor/<contenttype:contenttype>/",
+        KeysetModelViewSet.as_view({"get": "list"}),
+    )
+]